@@ -1,3 +1,7 @@
+import asyncio
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 import bcrypt
 from jose import JWTError, jwt
@@ -14,7 +18,7 @@ def _truncate_password(password: str) -> bytes:
 
 def hash_password(password: str) -> str:
     pwd = _truncate_password(password)
-    return bcrypt.hashpw(pwd, bcrypt.gensalt()).decode("utf-8")
+    return bcrypt.hashpw(pwd, bcrypt.gensalt(rounds=settings.bcrypt_rounds)).decode("utf-8")
 
 
 def verify_password(plain: str, hashed: str) -> bool:
@@ -22,16 +26,111 @@ def verify_password(plain: str, hashed: str) -> bool:
     return bcrypt.checkpw(pwd, hashed.encode("utf-8"))
 
 
-def create_access_token(subject: str | int) -> str:
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    """Runs bcrypt in a bounded thread pool (bcrypt releases the GIL) so it never blocks the event loop.
+
+    At most ``workers`` hashes run at once and ``max_pending`` more may wait; beyond that
+    calls fail fast with PasswordHasherBusy instead of queueing without bound.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self._capacity = workers + max_pending
+        self._in_flight = 0
+        self._executor: ThreadPoolExecutor | None = None
+
+    async def _run(self, fn, *args):
+        if self._in_flight >= self._capacity:
+            raise PasswordHasherBusy
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain: str, hashed: str) -> bool:
+        return await self._run(verify_password, plain, hashed)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(settings.password_hash_workers, settings.password_hash_queue)
+
+
+def create_access_token(subject: str | int, token_version: int = 0) -> str:
     expire = datetime.now(timezone.utc) + timedelta(minutes=settings.access_token_expire_minutes)
-    to_encode = {"sub": str(subject), "exp": expire}
+    to_encode = {"sub": str(subject), "exp": expire, "ver": token_version}
     return jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
 
 
-def decode_access_token(token: str) -> str | None:
+def decode_access_token_claims(token: str) -> dict | None:
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        sub = payload.get("sub")
-        return str(sub) if sub is not None else None
+        return jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
     except JWTError:
         return None
+
+
+class TokenCache:
+    """Tokens already checked against the database, so repeat requests need no user lookup.
+
+    Entries live ``ttl`` seconds at most and never past the token's ``exp``. Revocation
+    (bumping ``User.token_version``) is recorded here and checked first (``revoked_before``), so
+    it takes effect immediately in this process; other workers see it once their entry
+    expires and the next lookup reads the new version. A record is dropped ``token_lifetime``
+    seconds after the revocation: every token it rejects has expired by then.
+    """
+
+    def __init__(self, ttl: int, max_entries: int, token_lifetime: float):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.token_lifetime = token_lifetime
+        self._entries: OrderedDict[str, tuple[int, int, float]] = OrderedDict()
+        # user id -> (lowest accepted token version, revoked at), oldest revocation first
+        self._revoked: OrderedDict[int, tuple[int, float]] = OrderedDict()
+
+    def get(self, token: str) -> tuple[int, int] | None:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        user_id, version, expires_at = entry
+        if expires_at < time.time() or version < self.revoked_before(user_id):
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return user_id, version
+
+    def put(self, token: str, user_id: int, version: int, exp: float) -> None:
+        self._entries[token] = (user_id, version, min(exp, time.time() + self.ttl))
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def revoked_before(self, user_id: int) -> int:
+        """Token version below which ``user_id``'s tokens were revoked recently (0 if none)."""
+        entry = self._revoked.get(user_id)
+        return entry[0] if entry is not None else 0
+
+    def revoke(self, user_id: int, version: int) -> None:
+        """Reject cached tokens of ``user_id`` older than ``version``."""
+        now = time.time()
+        while self._revoked and next(iter(self._revoked.values()))[1] < now - self.token_lifetime:
+            self._revoked.popitem(last=False)
+        self._revoked[user_id] = (max(version, self.revoked_before(user_id)), now)
+        self._revoked.move_to_end(user_id)
+
+
+token_cache = TokenCache(
+    settings.auth_cache_ttl_seconds, settings.auth_cache_max_entries, settings.access_token_expire_minutes * 60
+)
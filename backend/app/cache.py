@@ -0,0 +1,319 @@
+"""Response cache for catalog endpoints.
+
+Entries are serialized response bodies keyed by endpoint namespace, the catalog version and
+the normalized query parameters. Any ORM change to ``Product`` bumps the catalog version, so
+stale entries are never read again and simply age out of the backend.
+
+Each entry is stored with its ETag, a hash of the body: it changes whenever the content does
+(including writes from other processes, once the entry is rebuilt) and is the same in every worker.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from itertools import chain
+from typing import Any, Awaitable, Callable, Protocol
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import AFTER_COMMIT_TASKS, replica_router
+from app.metrics import Counter
+from app.models import Product
+
+VERSION_KEY = "catalog:version"
+# Stored entries are the quoted 40-character SHA-1 ETag followed by the body.
+ETAG_LENGTH = 42
+
+cache_requests = Counter(
+    "catalog_cache_requests_total", "Response cache lookups by endpoint and result.", ("namespace", "result")
+)
+cache_invalidations = Counter("catalog_cache_invalidations_total", "Catalog version bumps.")
+coalesced_calls = Counter(
+    "catalog_coalesced_calls_total", "Catalog bodies built (leaders of coalesced requests).", ("namespace",)
+)
+coalesced_requests = Counter(
+    "catalog_coalesced_requests_total", "Requests served by another request's in-flight build.", ("namespace",)
+)
+
+
+class CacheBackend(Protocol):
+    async def get(self, key: str) -> bytes | None: ...
+
+    async def get_many(self, keys: list[str]) -> list[bytes | None]: ...
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None: ...
+
+    async def incr(self, key: str) -> int: ...
+
+
+class LocalCache:
+    """In-process LRU with per-entry TTL. Counters (``incr``) are kept apart and never evicted."""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._counters: dict[str, int] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        if key in self._counters:
+            return str(self._counters[key]).encode()
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def get_many(self, keys: list[str]) -> list[bytes | None]:
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+
+class RedisCache:
+    """Backend over any client with the redis.asyncio ``get``/``mget``/``set(ex=)``/``incr`` interface."""
+
+    def __init__(self, client: Any, prefix: str = "catalog-api:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.client.get(self.prefix + key)
+
+    async def get_many(self, keys: list[str]) -> list[bytes | None]:
+        return await self.client.mget([self.prefix + key for key in keys])
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        await self.client.set(self.prefix + key, value, ex=ttl)
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(self.prefix + key)
+
+
+class FakeRedis:
+    """In-memory stand-in for a redis.asyncio client, enough for RedisCache in tests."""
+
+    def __init__(self):
+        self.data: dict[str, tuple[float | None, bytes]] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    async def mget(self, keys: list[str]) -> list[bytes | None]:
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key: str, value: bytes, ex: int | None = None) -> bool:
+        self.data[key] = (time.monotonic() + ex if ex else None, value)
+        return True
+
+    async def incr(self, key: str) -> int:
+        value = int(await self.get(key) or 0) + 1
+        self.data[key] = (None, str(value).encode())
+        return value
+
+
+def make_backend(name: str) -> CacheBackend:
+    if name == "redis":
+        import redis.asyncio as redis
+
+        return RedisCache(redis.from_url(settings.redis_url))
+    if name == "none":
+        return LocalCache(max_entries=0)
+    return LocalCache(max_entries=settings.cache_max_entries)
+
+
+class ResponseCache:
+    def __init__(self, backend: CacheBackend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+        self._pending: set[asyncio.Task] = set()
+
+    async def version(self) -> int:
+        return int(await self.backend.get(VERSION_KEY) or 0)
+
+    @staticmethod
+    def key(namespace: str, version: int, params: dict[str, Any]) -> str:
+        raw = json.dumps(params, sort_keys=True, default=str, separators=(",", ":"))
+        return f"{namespace}:{version}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+    async def entry_key(self, namespace: str, params: dict[str, Any]) -> str:
+        return self.key(namespace, await self.version(), params)
+
+    @staticmethod
+    def etag(body: bytes) -> str:
+        """Strong validator for ``body``."""
+        return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+    async def get(self, namespace: str, key: str) -> tuple[str, bytes] | None:
+        """``(etag, body)`` of a cached entry, or None on a miss."""
+        value = await self.backend.get(key)
+        cache_requests.inc(namespace=namespace, result="hit" if value is not None else "miss")
+        if value is None:
+            return None
+        return value[:ETAG_LENGTH].decode(), value[ETAG_LENGTH:]
+
+    async def get_many(self, namespace: str, keys: list[str]) -> list[bytes | None]:
+        """Bodies only, for callers that stitch entries into a larger response."""
+        values = await self.backend.get_many(keys) if keys else []
+        hits = sum(value is not None for value in values)
+        cache_requests.inc(hits, namespace=namespace, result="hit")
+        cache_requests.inc(len(values) - hits, namespace=namespace, result="miss")
+        return [value[ETAG_LENGTH:] if value is not None else None for value in values]
+
+    async def set(self, key: str, body: bytes, etag: str | None = None) -> str:
+        """Store ``body`` with ``etag`` (by default its own hash); returns the ETag."""
+        etag = etag or self.etag(body)
+        await self.backend.set(key, etag.encode() + body, self.ttl)
+        return etag
+
+    async def invalidate(self) -> None:
+        await self.backend.incr(VERSION_KEY)
+        cache_invalidations.inc()
+
+    def invalidate_soon(self) -> asyncio.Task | None:
+        """Schedule ``invalidate`` from synchronous code (ORM events); no-op without a running loop."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        task = loop.create_task(self.invalidate())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return task
+
+
+class VersionedSnapshot:
+    """A value computed once per catalog version and kept in process for at most the cache TTL.
+
+    The version only moves on ORM writes seen by this deployment's cache; the TTL bounds how
+    long writes from elsewhere (import scripts, other processes with a memory backend) go unseen.
+    """
+
+    def __init__(self, cache: ResponseCache):
+        self.cache = cache
+        self._version: int | None = None
+        self._expires_at = 0.0
+        self._value: Any = None
+        self._lock = asyncio.Lock()
+
+    def _fresh(self, version: int) -> bool:
+        return self._version == version and time.monotonic() < self._expires_at
+
+    async def get(self, load: Callable[[], Awaitable[Any]]) -> Any:
+        version = await self.cache.version()
+        if self._fresh(version):
+            return self._value
+        async with self._lock:
+            # Another request may have refreshed it while this one waited.
+            if not self._fresh(version):
+                self._value = await load()
+                self._version = version
+                self._expires_at = time.monotonic() + self.cache.ttl
+            return self._value
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls in this process: one runs, the others await its result.
+
+    The first caller for a key (the leader) runs ``fn``; callers arriving while it is in flight
+    get the same result or exception instead of running it again. Nothing is kept once the call
+    finishes, so this only collapses bursts (e.g. a popular page right after the catalog version
+    changed, or with the cache disabled). If the leader is cancelled, waiters retry and one of
+    them leads.
+    """
+
+    def __init__(self):
+        self._calls: dict[tuple[str, str], asyncio.Future] = {}
+
+    async def do(self, namespace: str, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if not settings.request_coalescing:
+            return await fn()
+        call_key = (namespace, key)
+        if call_key in self._calls:
+            # Counted once per waiter, even if it ends up retrying after a cancelled leader.
+            coalesced_requests.inc(namespace=namespace)
+        while (call := self._calls.get(call_key)) is not None:
+            try:
+                # Shielded: a waiter that is cancelled must not cancel the shared call.
+                return await asyncio.shield(call)
+            except asyncio.CancelledError:
+                if not call.cancelled():
+                    raise
+        call = asyncio.get_running_loop().create_future()
+        # Marks a failure as retrieved when nobody else was waiting for it.
+        call.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[call_key] = call
+        coalesced_calls.inc(namespace=namespace)
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            del self._calls[call_key]
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """``If-None-Match`` uses weak comparison, so ``W/`` prefixes are ignored."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+response_cache = ResponseCache(make_backend(settings.cache_backend), settings.cache_ttl_seconds)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_product_flush(session: Session, flush_context) -> None:
+    if any(isinstance(obj, Product) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info["catalog_changed"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_product_statement(orm_execute_state) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ is Product:
+            orm_execute_state.session.info["catalog_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    if session.info.pop("catalog_changed", False):
+        replica_router.hold_primary()
+        task = response_cache.invalidate_soon()
+        if task is not None:
+            # Awaited by PrimarySession.commit, so the old version's entries are never served after it.
+            session.info.setdefault(AFTER_COMMIT_TASKS, []).append(task)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop("catalog_changed", None)
@@ -0,0 +1,58 @@
+"""Client-held cart tokens (``cart_storage = "token"``).
+
+A small cart lives in the ``X-Cart-Token`` header instead of the database: the issue time and the
+lines as ``product_id:quantity`` pairs, plus an HMAC-SHA256 keyed by ``secret_key`` over them and
+the ``X-Session-ID`` they were issued to, e.g. ``1760770000/12:1,40:3.<signature>``. The server only
+issues tokens for lines it validated, so a token that verifies is trusted as is; anything else
+(tampered, malformed, another session's, older than ``cart_ttl_days``, signed with an old key)
+reads as no token at all. Carts are written to the database once they grow past
+``cart_token_max_lines`` or when the user logs in (see ``app.routers.cart``).
+"""
+import base64
+import hashlib
+import hmac
+import time
+from app.config import settings
+from app.metrics import Counter
+
+# Domain separation from the other uses of secret_key (JWT signing).
+_CONTEXT = b"cart-token:"
+
+cart_tokens_persisted = Counter(
+    "cart_tokens_persisted_total", "Token carts written to the database.", ("reason",)
+)
+
+
+def enabled() -> bool:
+    return settings.cart_storage == "token"
+
+
+def _signature(session_id: str, payload: bytes) -> bytes:
+    message = _CONTEXT + session_id.encode() + b"\n" + payload
+    digest = hmac.new(settings.secret_key.encode(), message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=")
+
+
+def encode(session_id: str, lines: dict[int, int]) -> str:
+    items = ",".join(f"{product_id}:{quantity}" for product_id, quantity in lines.items())
+    payload = f"{int(time.time())}/{items}"
+    return f"{payload}.{_signature(session_id, payload.encode()).decode()}"
+
+
+def decode(token: str, session_id: str) -> dict[int, int] | None:
+    """Lines of a valid token (possibly empty), or None if the token does not verify or has expired."""
+    payload, _, signature = token.rpartition(".")
+    # Bytes, not str: compare_digest rejects non-ASCII strings, and the header is client input.
+    if not hmac.compare_digest(signature.encode(), _signature(session_id, payload.encode())):
+        return None
+    issued_at, _, items = payload.partition("/")
+    lines: dict[int, int] = {}
+    try:
+        if time.time() - int(issued_at) > settings.cart_ttl_days * 86400:
+            return None
+        for pair in filter(None, items.split(",")):
+            product_id, quantity = pair.split(":")
+            lines[int(product_id)] = int(quantity)
+    except ValueError:
+        return None
+    return lines
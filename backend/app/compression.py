@@ -0,0 +1,169 @@
+"""Response compression: gzip always, brotli and zstd when their packages are installed.
+
+``CompressionMiddleware`` compresses complete (non-streaming) responses above
+``compression_min_size``. Catalog endpoints compress their cached bodies themselves and keep the
+encoded bytes in the response cache (see ``app.routers.products``); the middleware leaves any
+response that already has a ``Content-Encoding`` alone.
+"""
+import gzip
+import time
+from starlette.datastructures import Headers, MutableHeaders
+from app.config import settings
+from app.metrics import Counter, Histogram
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+compression_bytes_in = Counter("http_compression_input_bytes_total", "Bytes before compression.", ("encoding",))
+compression_bytes_out = Counter("http_compression_output_bytes_total", "Bytes after compression.", ("encoding",))
+compression_seconds = Histogram(
+    "http_compression_seconds",
+    "CPU-bound time spent compressing one response body.",
+    ("encoding",),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def _gzip(data: bytes, level: int) -> bytes:
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _brotli(data: bytes, level: int) -> bytes:
+    return brotli.compress(data, quality=level)
+
+
+def _zstd(data: bytes, level: int) -> bytes:
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+# Server preference order; the client's q-values decide between acceptable ones first.
+ENCODERS = {
+    name: encoder
+    for name, encoder, available in (
+        ("br", _brotli, brotli is not None),
+        ("zstd", _zstd, zstandard is not None),
+        ("gzip", _gzip, True),
+    )
+    if available
+}
+
+
+def default_level(encoding: str) -> int:
+    return {"br": settings.brotli_quality, "zstd": settings.zstd_level}.get(encoding, settings.gzip_level)
+
+
+def accept_weights(accept_encoding: str | None) -> dict[str, float]:
+    """q-value of each coding named in an ``Accept-Encoding`` header (``*`` included)."""
+    weights: dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    return weights
+
+
+def accepts(accept_encoding: str | None, encoding: str) -> bool:
+    """Whether the client accepts ``encoding`` (explicitly or through ``*``) with a non-zero q."""
+    weights = accept_weights(accept_encoding)
+    return weights.get(encoding, weights.get("*", 0.0)) > 0
+
+
+def negotiate(accept_encoding: str | None) -> str | None:
+    """Best available encoding for an ``Accept-Encoding`` header, or None for identity."""
+    if not accept_encoding or not settings.compression_enabled:
+        return None
+    weights = accept_weights(accept_encoding)
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for name in ENCODERS:
+        q = weights.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compress(data: bytes, encoding: str, level: int | None = None) -> bytes:
+    started = time.perf_counter()
+    encoded = ENCODERS[encoding](data, default_level(encoding) if level is None else level)
+    compression_seconds.observe(time.perf_counter() - started, encoding=encoding)
+    compression_bytes_in.inc(len(data), encoding=encoding)
+    compression_bytes_out.inc(len(encoded), encoding=encoding)
+    return encoded
+
+
+def add_vary(headers: MutableHeaders) -> None:
+    vary = headers.get("vary")
+    if not vary:
+        headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding"
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing complete response bodies of compressible types."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            headers = MutableHeaders(scope=start_message)
+            body = message.get("body", b"")
+            if (
+                message.get("more_body", False)
+                or "content-encoding" in headers
+                or start_message["status"] in (204, 304)
+                or len(body) < settings.compression_min_size
+                or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            ):
+                # Streaming, already encoded or not worth it: send as is.
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            add_vary(headers)
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -4,10 +4,86 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     database_url: str = "postgresql+asyncpg://postgres:postgres@db:5432/catalog"
     sync_database_url: str = "postgresql://postgres:postgres@db:5432/catalog"
+    # Optional streaming replica for catalog reads; empty means everything uses database_url
+    read_database_url: str = ""
+    # Reads fall back to the primary while the replica lags more than this (and for this long after
+    # a catalog write from this process); the replica is re-checked every interval
+    replica_max_lag_seconds: float = 5.0
+    replica_check_interval_seconds: float = 5.0
     cors_origins: str = "*"
     secret_key: str = "your-secret-key-change-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 60
+    # Connection pool per worker process (a worker may hold up to db_pool_size + db_max_overflow connections)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = False
+    # asyncpg prepared statements cached per connection; PgBouncer mode (transaction pooling)
+    # turns the caches off and gives every prepared statement a unique name
+    db_statement_cache_size: int = 100
+    db_pgbouncer: bool = False
+    # Instrumentation: Server-Timing response header (off by default: it exposes DB time and query
+    # counts to every client) and the slow-query log threshold (0 disables)
+    server_timing: bool = False
+    slow_query_ms: float = 200.0
+    bcrypt_rounds: int = 12
+    # Verified tokens are trusted without a user lookup for this long (never past their exp)
+    auth_cache_ttl_seconds: int = 300
+    auth_cache_max_entries: int = 10000
+    # bcrypt runs in a dedicated thread pool; beyond workers + queue, auth endpoints answer 503
+    password_hash_workers: int = 4
+    password_hash_queue: int = 32
+    # Rate limiting with token buckets: memory (per worker), redis (shared by workers) or none.
+    # Every request is limited per client IP to rate_limit_rps with bursts of rate_limit_burst;
+    # the rate_limit_<route>_* pairs are the tighter per-route limits (app.ratelimit.RateLimit).
+    # Client IPs are only real behind a proxy whose address is in uvicorn's --forwarded-allow-ips
+    rate_limit_backend: str = "memory"
+    rate_limit_max_keys: int = 100_000
+    rate_limit_rps: float = 50.0
+    rate_limit_burst: int = 100
+    rate_limit_catalog_rps: float = 10.0
+    rate_limit_catalog_burst: int = 50
+    rate_limit_export_rps: float = 1 / 30
+    rate_limit_export_burst: int = 2
+    rate_limit_cart_rps: float = 5.0
+    rate_limit_cart_burst: int = 30
+    rate_limit_login_rps: float = 0.2
+    rate_limit_login_burst: int = 5
+    rate_limit_register_rps: float = 1 / 60
+    rate_limit_register_burst: int = 3
+    rate_limit_revoke_rps: float = 1 / 60
+    rate_limit_revoke_burst: int = 3
+    # Cart storage: "server" (a carts row per session) or "token": small carts travel in a signed
+    # X-Cart-Token header and reach the database only past cart_token_max_lines lines or at login
+    cart_storage: str = "server"
+    cart_token_max_lines: int = 10
+    # Cart garbage collection: carts untouched for cart_ttl_days are deleted (empty ones after
+    # cart_empty_ttl_hours), cart_sweep_batch_size per transaction with a pause between batches;
+    # the background sweeper runs every cart_sweep_interval_seconds (0 disables it)
+    cart_ttl_days: int = 30
+    cart_empty_ttl_hours: int = 24
+    cart_sweep_interval_seconds: int = 3600
+    cart_sweep_batch_size: int = 500
+    cart_sweep_pause_seconds: float = 0.5
+
+    # Response cache for catalog endpoints: memory, redis or none
+    cache_backend: str = "memory"
+    cache_ttl_seconds: int = 300
+    cache_max_entries: int = 2048
+    # Concurrent identical catalog requests in a worker share one database call
+    request_coalescing: bool = True
+    redis_url: str = "redis://localhost:6379/0"
+    # HTTP caching headers sent with catalog responses (ETag is always sent)
+    catalog_cache_control: str = "public, max-age=60"
+    catalog_vary: str = "Accept-Encoding"
+    # Response compression (gzip; br and zstd when brotli / zstandard are installed)
+    compression_enabled: bool = True
+    compression_min_size: int = 1024
+    gzip_level: int = 6
+    brotli_quality: int = 4
+    zstd_level: int = 3
 
     class Config:
         env_file = ".env"
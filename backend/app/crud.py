@@ -1,9 +1,120 @@
 from decimal import Decimal
-from sqlalchemy import select, func, or_
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from typing import Any, NamedTuple
+from sqlalchemy import Integer, Row, Select, and_, any_, case, delete, func, literal, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+from app.explain import Explain, plan_root
 from app.models import Product, Cart, CartItem, User
-from app.schemas import CartItemResponse
+from app.search import search_condition, search_rank
+from app.schemas import CartItemResponse, CartOperation
+
+# Columns of a list item (ProductListResponse); selecting them skips ORM object hydration.
+PRODUCT_LIST_COLUMNS = (Product.id, Product.name, Product.price, Product.image, Product.category)
+
+# Lower bounds of the facet price buckets after the first one (which starts at 0).
+PRICE_BUCKET_BOUNDS = (Decimal(1000), Decimal(5000), Decimal(10000), Decimal(25000), Decimal(50000))
+
+
+def product_filters(
+    *,
+    category: str | None = None,
+    min_price: Decimal | None = None,
+    max_price: Decimal | None = None,
+    search: str | None = None,
+) -> list[ColumnElement[bool]]:
+    conditions = []
+    if category:
+        conditions.append(Product.category == category)
+    if min_price is not None:
+        conditions.append(Product.price >= min_price)
+    if max_price is not None:
+        conditions.append(Product.price <= max_price)
+    if search:
+        conditions.append(search_condition(search))
+    return conditions
+
+
+async def estimate_count(db: AsyncSession, query: Select) -> int | None:
+    """Planner row estimate for ``query`` (PostgreSQL only, None elsewhere)."""
+    if db.bind.dialect.name != "postgresql":
+        return None
+    plan = plan_root(await db.scalar(Explain(query)))
+    return int(plan["Plan Rows"])
+
+
+def products_page_query(
+    *,
+    limit: int | None = 20,
+    offset: int = 0,
+    category: str | None = None,
+    min_price: Decimal | None = None,
+    max_price: Decimal | None = None,
+    search: str | None = None,
+    sort_by: str = "id",
+    sort_order: str = "asc",
+    keyset: tuple[Any, int] | None = None,
+    backwards: bool = False,
+    columns: tuple[ColumnElement, ...] | None = None,
+) -> Select:
+    """The page statement of ``get_products`` (without a total); ``limit=None`` selects every match."""
+    conditions = product_filters(category=category, min_price=min_price, max_price=max_price, search=search)
+    query = (select(*columns) if columns else select(Product)).where(*conditions)
+    if sort_by == "relevance" and search:
+        sort_col = search_rank(search)
+    else:
+        sort_col = getattr(Product, sort_by, Product.id)
+    ascending = (sort_order.lower() != "desc") != backwards
+    if keyset is not None:
+        key, last_id = keyset
+        if sort_col is Product.id:
+            query = query.where(Product.id > last_id if ascending else Product.id < last_id)
+        else:
+            row = tuple_(sort_col, Product.id)
+            query = query.where(row > (key, last_id) if ascending else row < (key, last_id))
+    order_cols = [sort_col] if sort_col is Product.id else [sort_col, Product.id]
+    query = query.order_by(*(c.asc() if ascending else c.desc() for c in order_cols)).limit(limit)
+    if keyset is None and offset:
+        query = query.offset(offset)
+    return query
+
+
+def products_count_query(
+    *,
+    category: str | None = None,
+    min_price: Decimal | None = None,
+    max_price: Decimal | None = None,
+    search: str | None = None,
+) -> Select:
+    conditions = product_filters(category=category, min_price=min_price, max_price=max_price, search=search)
+    return select(func.count()).select_from(Product).where(*conditions)
+
+
+def products_queries(*, count: str = "exact", **params) -> tuple[Select, Select | None]:
+    """The statements ``get_products`` runs: the page statement and the separate COUNT, if any.
+
+    For ``count="exact"`` the page statement carries ``count(*) OVER () AS total`` instead when
+    ``total_in_page``; any other ``count`` gets the plain page statement. ``params`` are those of
+    ``products_page_query``.
+    """
+    query = products_page_query(**params)
+    if count != "exact":
+        return query, None
+    if total_in_page(params.get("search"), params.get("keyset")):
+        return query.add_columns(func.count().over().label("total")), None
+    filters = {name: params.get(name) for name in ("category", "min_price", "max_price", "search")}
+    return query, products_count_query(**filters)
+
+
+def total_in_page(search: str | None, keyset: tuple[Any, int] | None) -> bool:
+    """Whether an exact total is computed in the page statement with ``count(*) OVER ()``.
+
+    The window makes the database read every matching row before LIMIT applies, which would
+    defeat the top-N index scans of plain listing pages. Searches read every match anyway (the
+    trigram index yields them unordered, relevance needs them all), so there it saves a statement.
+    """
+    return bool(search) and keyset is None
 
 
 async def get_products(
@@ -17,46 +128,130 @@ async def get_products(
     search: str | None = None,
     sort_by: str = "id",
     sort_order: str = "asc",
-) -> tuple[list[Product], int]:
-    query = select(Product)
-    count_query = select(func.count()).select_from(Product)
+    keyset: tuple[Any, int] | None = None,
+    backwards: bool = False,
+    count: str = "exact",
+    columns: tuple[ColumnElement, ...] | None = None,
+) -> tuple[list[Any], int | None]:
+    """Return a page of products and the total matching count.
 
-    if category:
-        query = query.where(Product.category == category)
-        count_query = count_query.where(Product.category == category)
-    if min_price is not None:
-        query = query.where(Product.price >= min_price)
-        count_query = count_query.where(Product.price >= min_price)
-    if max_price is not None:
-        query = query.where(Product.price <= max_price)
-        count_query = count_query.where(Product.price <= max_price)
-    if search:
-        pattern = f"%{search}%"
-        query = query.where(
-            or_(
-                Product.name.ilike(pattern),
-                Product.description.ilike(pattern),
-            )
-        )
-        count_query = count_query.where(
-            or_(
-                Product.name.ilike(pattern),
-                Product.description.ilike(pattern),
-            )
-        )
+    With ``keyset`` (the last seen ``(sort_key, id)``) rows are taken strictly after it in
+    the requested order, or strictly before it when ``backwards`` is set; ``offset`` is
+    ignored. Rows are always returned in the requested order.
 
-    total = await db.scalar(count_query)
+    ``count`` selects how the total is produced: ``exact`` runs a separate COUNT (see
+    ``total_in_page`` for when it is folded into the page statement), ``estimate`` uses the
+    planner row estimate, ``none`` skips it and returns None.
 
-    order_col = getattr(Product, sort_by, Product.id)
-    if sort_order.lower() == "desc":
-        order_col = order_col.desc()
+    With ``columns`` (e.g. ``PRODUCT_LIST_COLUMNS``) plain rows of those columns are returned
+    instead of ``Product`` instances.
+    """
+    filters = dict(category=category, min_price=min_price, max_price=max_price, search=search)
+
+    total = None
+    if count == "estimate":
+        total = await estimate_count(db, select(Product.id).where(*product_filters(**filters)))
+        count = "exact" if total is None else "none"
+    query, count_query = products_queries(
+        count=count,
+        limit=limit,
+        offset=offset,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        keyset=keyset,
+        backwards=backwards,
+        columns=columns,
+        **filters,
+    )
+    if count_query is not None:
+        total = await db.scalar(count_query)
+
+    if count == "exact" and count_query is None:
+        result = await db.execute(query)
+        rows = result.all()
+        products = rows if columns else [row[0] for row in rows]
+        if rows:
+            total = rows[0].total
+        elif offset:
+            total = await db.scalar(products_count_query(**filters))
+        else:
+            total = 0
     else:
-        order_col = order_col.asc()
-    query = query.order_by(order_col).limit(limit).offset(offset)
+        result = await db.execute(query)
+        products = list(result.all() if columns else result.scalars().all())
+    if backwards:
+        products.reverse()
+    return products, total
+
+
+async def get_facet_rows(
+    db: AsyncSession,
+    *,
+    min_price: Decimal | None = None,
+    max_price: Decimal | None = None,
+    search: str | None = None,
+) -> list[Row]:
+    """Product counts grouped by (category, price bucket, inside the price filter) in one query.
+
+    The category is not filtered here: category facets must count every category, and
+    ``fold_facets`` applies the selected category to the price buckets and the total.
+    """
+    bucket = case(
+        *((Product.price < bound, i) for i, bound in enumerate(PRICE_BUCKET_BOUNDS)),
+        else_=len(PRICE_BUCKET_BOUNDS),
+    ).label("bucket")
+    price_conditions = product_filters(min_price=min_price, max_price=max_price)
+    in_range = (
+        case((and_(*price_conditions), 1), else_=0) if price_conditions else literal(1, Integer)
+    ).label("in_range")
+    query = (
+        select(
+            Product.category,
+            bucket,
+            in_range,
+            func.count().label("count"),
+            func.min(Product.price).label("min_price"),
+            func.max(Product.price).label("max_price"),
+        )
+        .where(*product_filters(search=search))
+        .group_by(Product.category, bucket, in_range)
+    )
+    return list((await db.execute(query)).all())
+
+
+def fold_facets(rows: list[Row], category: str | None = None) -> dict:
+    """Facets for one filter context from ``get_facet_rows`` output.
 
-    result = await db.execute(query)
-    products = result.scalars().all()
-    return list(products), total
+    Category counts honour the price and search filters; price buckets and the price range honour
+    the category and search filters; ``count`` honours all of them.
+    """
+    categories: dict[str, int] = {}
+    buckets = [0] * (len(PRICE_BUCKET_BOUNDS) + 1)
+    total = 0
+    low = high = None
+    for row in rows:
+        in_category = category is None or row.category == category
+        if row.in_range:
+            categories[row.category] = categories.get(row.category, 0) + row.count
+        if in_category:
+            buckets[row.bucket] += row.count
+            low = row.min_price if low is None else min(low, row.min_price)
+            high = row.max_price if high is None else max(high, row.max_price)
+            if row.in_range:
+                total += row.count
+    bounds = (Decimal(0), *PRICE_BUCKET_BOUNDS, None)
+    return {
+        "count": total,
+        "min_price": low,
+        "max_price": high,
+        "categories": [
+            {"category": name, "count": count}
+            for name, count in sorted(categories.items(), key=lambda item: (-item[1], item[0]))
+        ],
+        "price_buckets": [
+            {"min": bounds[i], "max": bounds[i + 1], "count": count} for i, count in enumerate(buckets)
+        ],
+    }
 
 
 async def get_product_by_id(db: AsyncSession, product_id: int) -> Product | None:
@@ -64,6 +259,16 @@ async def get_product_by_id(db: AsyncSession, product_id: int) -> Product | None
     return result.scalar_one_or_none()
 
 
+async def get_products_by_ids(db: AsyncSession, ids: list[int]) -> dict[int, Product]:
+    if db.bind.dialect.name == "postgresql":
+        # One array parameter keeps a single prepared statement for any batch size.
+        condition = Product.id == any_(literal(ids, ARRAY(Integer)))
+    else:
+        condition = Product.id.in_(ids)
+    result = await db.execute(select(Product).where(condition))
+    return {product.id: product for product in result.scalars()}
+
+
 async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
     result = await db.execute(select(User).where(User.email == email))
     return result.scalar_one_or_none()
@@ -74,6 +279,13 @@ async def get_user_by_id(db: AsyncSession, user_id: int) -> User | None:
     return result.scalar_one_or_none()
 
 
+async def bump_token_version(db: AsyncSession, user_id: int) -> int | None:
+    result = await db.execute(
+        update(User).where(User.id == user_id).values(token_version=User.token_version + 1).returning(User.token_version)
+    )
+    return result.scalar_one_or_none()
+
+
 async def create_user(db: AsyncSession, email: str, hashed_password: str) -> User:
     user = User(email=email, hashed_password=hashed_password)
     db.add(user)
@@ -81,81 +293,335 @@ async def create_user(db: AsyncSession, email: str, hashed_password: str) -> Use
     return user
 
 
-async def get_or_create_cart(db: AsyncSession, session_id: str) -> Cart:
-    result = await db.execute(select(Cart).where(Cart.session_id == session_id))
-    cart = result.scalar_one_or_none()
-    if cart is None:
-        cart = Cart(session_id=session_id)
-        db.add(cart)
-        await db.flush()
-    return cart
+def _insert(db: AsyncSession):
+    """Dialect ``insert`` construct, which carries ``on_conflict_do_update``."""
+    return pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
 
 
-async def get_cart_by_session(db: AsyncSession, session_id: str) -> Cart | None:
-    result = await db.execute(select(Cart).where(Cart.session_id == session_id))
-    return result.scalar_one_or_none()
+async def ensure_cart(db: AsyncSession, session_id: str) -> int:
+    """Get or create the session's cart in one statement and return its id."""
+    carts = Cart.__table__
+    # Timestamps are set explicitly: databases upgraded by migration 0007 have no column defaults
+    # on SQLite, where ALTER TABLE cannot add them.
+    stmt = _insert(db)(carts).values(session_id=session_id, created_at=func.now(), updated_at=func.now())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[carts.c.session_id], set_={"session_id": stmt.excluded.session_id, "updated_at": func.now()}
+    ).returning(carts.c.id)
+    return await db.scalar(stmt)
 
 
-async def get_cart_with_items(db: AsyncSession, cart_id: int) -> Cart | None:
-    """Load cart with items and product for each item (avoids lazy load in async)."""
-    result = await db.execute(
-        select(Cart)
-        .where(Cart.id == cart_id)
-        .options(selectinload(Cart.items).selectinload(CartItem.product))
+async def lock_cart(db: AsyncSession, session_id: str) -> int | None:
+    """Id of the session's cart, row-locked until commit; None if the session has no cart.
+
+    Every cart mutation takes this lock first (``ensure_cart`` through its upsert, line updates
+    and deletes through ``_locked_cart_id``), so mutations of one cart and their total
+    adjustments apply one at a time.
+    """
+    return await db.scalar(select(Cart.id).where(Cart.session_id == session_id).with_for_update())
+
+
+async def get_cart_summary(db: AsyncSession, session_id: str) -> Row | None:
+    """``(id, item_count, total)`` of the session's cart from the cart row alone."""
+    result = await db.execute(select(Cart.id, Cart.item_count, Cart.total).where(Cart.session_id == session_id))
+    return result.first()
+
+
+def _product_price(product_id: int):
+    return select(Product.price).where(Product.id == product_id).scalar_subquery()
+
+
+async def adjust_cart_totals(db: AsyncSession, cart_id: int, quantity: int, amount) -> None:
+    """Add ``quantity`` items worth ``amount`` (a Decimal or SQL expression) to the cart's running totals."""
+    carts = Cart.__table__
+    await db.execute(
+        update(carts)
+        .where(carts.c.id == cart_id)
+        .values(item_count=carts.c.item_count + quantity, total=carts.c.total + amount)
     )
-    return result.scalar_one_or_none()
 
 
-async def add_cart_item(db: AsyncSession, cart_id: int, product_id: int, quantity: int) -> CartItem | None:
-    product = await get_product_by_id(db, product_id)
-    if not product:
-        return None
-    result = await db.execute(
-        select(CartItem).where(CartItem.cart_id == cart_id, CartItem.product_id == product_id)
+async def add_cart_item(db: AsyncSession, cart_id: int, product_id: int, quantity: int) -> int | None:
+    """Insert the line or increment its quantity; returns the item id, or None if the product does not exist."""
+    items = CartItem.__table__
+    source = select(literal(cart_id, Integer), Product.id, literal(quantity, Integer)).where(Product.id == product_id)
+    stmt = _insert(db)(items).from_select(["cart_id", "product_id", "quantity"], source)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[items.c.cart_id, items.c.product_id],
+        set_={"quantity": items.c.quantity + stmt.excluded.quantity},
+    ).returning(items.c.id)
+    item_id = await db.scalar(stmt)
+    if item_id is not None:
+        await adjust_cart_totals(db, cart_id, quantity, _product_price(product_id) * quantity)
+    return item_id
+
+
+def fold_cart_operations(operations: list[CartOperation]) -> dict[int, tuple[str, int]]:
+    """Reduce ordered operations to one final ``(op, quantity)`` per product: add, set or remove."""
+    state: dict[int, tuple[str, int]] = {}
+    for operation in operations:
+        previous = state.get(operation.product_id)
+        if operation.op == "add":
+            if previous is None or previous[0] == "add":
+                state[operation.product_id] = ("add", (previous[1] if previous else 0) + operation.quantity)
+            elif previous[0] == "set":
+                state[operation.product_id] = ("set", previous[1] + operation.quantity)
+            else:
+                state[operation.product_id] = ("set", operation.quantity)
+        elif operation.op == "set":
+            state[operation.product_id] = ("set", operation.quantity)
+        else:
+            state[operation.product_id] = ("remove", 0)
+    return state
+
+
+async def apply_cart_operations(db: AsyncSession, cart_id: int, operations: list[CartOperation]) -> list[int]:
+    """Apply operations with at most one statement per kind; returns unknown product ids (nothing applied then)."""
+    state = fold_cart_operations(operations)
+    prices = dict((await db.execute(select(Product.id, Product.price).where(Product.id.in_(state)))).all())
+    missing = [pid for pid, (kind, _) in state.items() if kind != "remove" and pid not in prices]
+    if missing:
+        return missing
+    upserts = {pid: change for pid, change in state.items() if change[0] != "remove"}
+
+    items = CartItem.__table__
+    # Current quantities of lines that are replaced or removed, for the totals delta.
+    replaced = [pid for pid, (kind, _) in state.items() if kind != "add"]
+    current = {}
+    if replaced:
+        current = dict(
+            (
+                await db.execute(
+                    select(items.c.product_id, items.c.quantity).where(
+                        items.c.cart_id == cart_id, items.c.product_id.in_(replaced)
+                    )
+                )
+            ).all()
+        )
+    count, amount = 0, Decimal("0")
+    for pid, (kind, quantity) in state.items():
+        delta = quantity if kind == "add" else quantity - current.get(pid, 0)
+        if delta:
+            count += delta
+            amount += prices.get(pid, 0) * delta
+
+    insert = _insert(db)
+    for op, merge in (("add", True), ("set", False)):
+        rows = [
+            {"cart_id": cart_id, "product_id": pid, "quantity": quantity}
+            for pid, (kind, quantity) in upserts.items()
+            if kind == op
+        ]
+        if not rows:
+            continue
+        stmt = insert(items).values(rows)
+        quantity = items.c.quantity + stmt.excluded.quantity if merge else stmt.excluded.quantity
+        await db.execute(
+            stmt.on_conflict_do_update(index_elements=[items.c.cart_id, items.c.product_id], set_={"quantity": quantity})
+        )
+    removed = [pid for pid, (kind, _) in state.items() if kind == "remove"]
+    if removed:
+        await db.execute(delete(items).where(items.c.cart_id == cart_id, items.c.product_id.in_(removed)))
+    if count or amount:
+        await adjust_cart_totals(db, cart_id, count, amount)
+    return []
+
+
+def _locked_cart_id(session_id: str):
+    """``lock_cart`` as a scalar subquery, for statements that lock the cart before its lines.
+
+    Used in the WHERE clause of a line UPDATE/DELETE, it is evaluated before the line row is
+    locked, so the lock order (cart, then lines) matches the other mutations.
+    """
+    return select(Cart.id).where(Cart.session_id == session_id).with_for_update().scalar_subquery()
+
+
+async def set_cart_item_quantity(db: AsyncSession, session_id: str, item_id: int, quantity: int) -> int | None:
+    """Update a line of the session's cart and move its totals by the change; returns the cart id,
+    or None if the cart has no such line."""
+    items = CartItem.__table__
+    if db.bind.dialect.name == "postgresql":
+        # The FROM subquery locks the cart, then the line, and hands the line's quantity under those
+        # locks to RETURNING, so the delta comes out of the UPDATE itself.
+        old = (
+            select(items.c.id, items.c.quantity)
+            .where(items.c.id == item_id, items.c.cart_id == _locked_cart_id(session_id))
+            .with_for_update()
+            .subquery()
+        )
+        stmt = (
+            update(items)
+            .where(items.c.id == old.c.id)
+            .values(quantity=quantity)
+            .returning(items.c.cart_id, items.c.product_id, old.c.quantity)
+        )
+        line = (await db.execute(stmt)).first()
+        if line is None:
+            return None
+        delta = quantity - line.quantity
+        if delta:
+            await adjust_cart_totals(db, line.cart_id, delta, _product_price(line.product_id) * delta)
+        return line.cart_id
+    # SQLite's RETURNING cannot see FROM columns. Its writers are serialized database-wide, so move
+    # the totals by the line's current quantity first (the cart UPDATE doubles as the ownership
+    # check), then write the line.
+    carts, products = Cart.__table__, Product.__table__
+    line = select(items.c.quantity).where(items.c.id == item_id, items.c.cart_id == carts.c.id)
+    delta = quantity - line.scalar_subquery()
+    price = (
+        select(products.c.price)
+        .select_from(items.join(products, products.c.id == items.c.product_id))
+        .where(items.c.id == item_id)
+        .scalar_subquery()
     )
-    item = result.scalar_one_or_none()
-    if item:
-        item.quantity += quantity
-    else:
-        item = CartItem(cart_id=cart_id, product_id=product_id, quantity=quantity)
-        db.add(item)
-    await db.flush()
-    return item
+    stmt = (
+        update(carts)
+        .where(carts.c.session_id == session_id, line.exists())
+        .values(item_count=carts.c.item_count + delta, total=carts.c.total + price * delta)
+        .returning(carts.c.id)
+    )
+    cart_id = await db.scalar(stmt)
+    if cart_id is not None:
+        await db.execute(update(items).where(items.c.id == item_id).values(quantity=quantity))
+    return cart_id
 
 
-async def get_cart_item(db: AsyncSession, item_id: int, cart_id: int) -> CartItem | None:
-    result = await db.execute(
-        select(CartItem).where(CartItem.id == item_id, CartItem.cart_id == cart_id)
+async def remove_cart_item(db: AsyncSession, session_id: str, item_id: int) -> int | None:
+    """Delete a line of the session's cart; returns the cart id, or None if the cart has no such line."""
+    items = CartItem.__table__
+    stmt = (
+        delete(items)
+        .where(items.c.id == item_id, items.c.cart_id == _locked_cart_id(session_id))
+        .returning(items.c.cart_id, items.c.product_id, items.c.quantity)
     )
-    return result.scalar_one_or_none()
+    line = (await db.execute(stmt)).first()
+    if line is None:
+        return None
+    await adjust_cart_totals(db, line.cart_id, -line.quantity, _product_price(line.product_id) * -line.quantity)
+    return line.cart_id
 
 
-async def update_cart_item_quantity(db: AsyncSession, item: CartItem, quantity: int) -> CartItem:
-    item.quantity = quantity
-    await db.flush()
-    return item
+class _TokenLine(NamedTuple):
+    id: int
+    product_id: int
+    quantity: int
+    name: str
+    price: Decimal
+    image: str | None
 
 
-async def delete_cart_item(db: AsyncSession, item: CartItem) -> None:
-    await db.delete(item)
-    await db.flush()
+async def load_token_cart(db: AsyncSession, lines: dict[int, int]) -> dict:
+    """Cart response for client-held ``lines`` (cart id 0, item ids are product ids).
+
+    Lines whose product no longer exists are dropped from ``lines`` in place.
+    """
+    products = {}
+    if lines:
+        query = select(Product.id, Product.name, Product.price, Product.image).where(Product.id.in_(lines))
+        products = {row.id: row for row in (await db.execute(query)).all()}
+    for product_id in [product_id for product_id in lines if product_id not in products]:
+        del lines[product_id]
+    rows = []
+    for product_id, quantity in lines.items():
+        product = products[product_id]
+        rows.append(_TokenLine(product_id, product_id, quantity, product.name, product.price, product.image))
+    total = sum((row.price * row.quantity for row in rows), Decimal("0"))
+    return cart_to_response(0, rows, sum(lines.values()), total)
+
+
+async def save_token_cart(db: AsyncSession, session_id: str, lines: dict[int, int]) -> int:
+    """Write client-held lines to the session's cart (quantities replace, so a retry is idempotent)."""
+    cart_id = await ensure_cart(db, session_id)
+    # Token quantities accumulate past the per-request limit, so skip CartOperation validation.
+    operations = [
+        CartOperation.model_construct(op="set", product_id=product_id, quantity=quantity)
+        for product_id, quantity in lines.items()
+    ]
+    missing = await apply_cart_operations(db, cart_id, operations)
+    if missing:
+        # Products deleted since the token was issued.
+        await apply_cart_operations(db, cart_id, [op for op in operations if op.product_id not in missing])
+    return cart_id
+
+
+def _line_totals():
+    """``(item_count, total)`` of each cart's lines, as scalar subqueries correlated to ``carts``."""
+    carts, items, products = Cart.__table__, CartItem.__table__, Product.__table__
+    count = select(func.coalesce(func.sum(items.c.quantity), 0)).where(items.c.cart_id == carts.c.id)
+    total = (
+        select(func.coalesce(func.sum(items.c.quantity * products.c.price), 0))
+        .select_from(items.join(products, products.c.id == items.c.product_id))
+        .where(items.c.cart_id == carts.c.id)
+    )
+    return count.scalar_subquery(), total.scalar_subquery()
+
+
+async def recount_cart_totals(db: AsyncSession, cart_id: int) -> None:
+    """Set one (locked) cart's totals from its lines, to repair a cart whose totals drifted."""
+    carts = Cart.__table__
+    count, total = _line_totals()
+    await db.execute(update(carts).where(carts.c.id == cart_id).values(item_count=count, total=total))
+
+
+async def reconcile_cart_totals(db: AsyncSession | AsyncConnection) -> int:
+    """Recompute the totals of carts that drifted from their lines; returns the number of carts fixed.
+
+    Cart mutations keep totals exact; they drift only when the catalog itself changes (prices
+    updated or products deleted by an import), so run this after such changes.
+    """
+    carts = Cart.__table__
+    count, total = _line_totals()
+    # A catalog change is not cart activity: keep updated_at (and so the cart's expiry) as it was.
+    result = await db.execute(
+        update(carts)
+        .where(or_(carts.c.item_count != count, carts.c.total != total))
+        .values(item_count=count, total=total, updated_at=carts.c.updated_at)
+    )
+    return result.rowcount
+
+
+async def load_cart(db: AsyncSession, *, cart_id: int | None = None, session_id: str | None = None) -> dict | None:
+    """Cart with its lines and their products in a single joined query; None if the cart does not exist."""
+    query = (
+        select(
+            Cart.id.label("cart_id"),
+            Cart.item_count,
+            Cart.total,
+            CartItem.id,
+            CartItem.product_id,
+            CartItem.quantity,
+            Product.name,
+            Product.price,
+            Product.image,
+        )
+        .select_from(Cart)
+        .outerjoin(CartItem, CartItem.cart_id == Cart.id)
+        .outerjoin(Product, Product.id == CartItem.product_id)
+        .order_by(CartItem.id)
+    )
+    if cart_id is not None:
+        query = query.where(Cart.id == cart_id)
+    else:
+        query = query.where(Cart.session_id == session_id)
+    rows = (await db.execute(query)).all()
+    if not rows:
+        return None
+    head = rows[0]
+    return cart_to_response(head.cart_id, [row for row in rows if row.id is not None], head.item_count, head.total)
 
 
-def cart_to_response(cart: Cart) -> dict:
+def cart_to_response(cart_id: int, lines, item_count: int, total: Decimal) -> dict:
     items = []
-    total = Decimal("0")
-    for item in cart.items:
-        subtotal = item.product.price * item.quantity
-        total += subtotal
+    for line in lines:
+        subtotal = line.price * line.quantity
         items.append(
             CartItemResponse(
-                id=item.id,
-                product_id=item.product_id,
-                product_name=item.product.name,
-                product_price=item.product.price,
-                product_image=item.product.image,
-                quantity=item.quantity,
+                id=line.id,
+                product_id=line.product_id,
+                product_name=line.name,
+                product_price=line.price,
+                product_image=line.image,
+                quantity=line.quantity,
                 subtotal=subtotal,
             )
         )
-    return {"id": cart.id, "items": items, "total": total}
+    return {"id": cart_id, "items": items, "item_count": item_count, "total": total}
@@ -1,15 +1,264 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+import asyncio
+import time
+from typing import Any
+from uuid import uuid4
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
-from app.config import settings
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.config import Settings, settings
+from app.metrics import Counter, Gauge, Histogram
+from app.timing import current_timings, statement_finished
+
+pool_wait = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled database connection.",
+    ("role",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0),
+)
+pool_timeouts = Counter("db_pool_checkout_timeouts_total", "Checkouts that gave up after pool_timeout.", ("role",))
+pool_in_use = Gauge("db_pool_connections_in_use", "Connections currently checked out of the pool.", ("role",))
+pool_idle = Gauge("db_pool_connections_idle", "Open connections waiting in the pool.", ("role",))
+pool_overflow = Gauge(
+    "db_pool_overflow", "Connections opened beyond pool_size (negative while below it).", ("role",)
+)
+catalog_reads = Counter("db_catalog_reads_total", "Catalog read sessions by the database they used.", ("target",))
+replica_lag = Gauge("db_replica_lag_seconds", "Replication lag seen by the last replica check.")
+replica_healthy = Gauge("db_replica_healthy", "1 while catalog reads are allowed on the replica.")
+replica_failovers = Counter(
+    "db_replica_failovers_total", "Catalog reads retried on the primary after the replica failed mid-request."
+)
+
+# Errors that mean the database (not the statement) failed.
+CONNECTION_ERRORS = (OSError, exc.OperationalError, exc.InterfaceError)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+
+    role = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_timeouts.inc(role=self.role)
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            pool_wait.observe(waited, role=self.role)
+            timings = current_timings()
+            if timings is not None:
+                timings.pool_wait += waited
+
+
+class ReplicaPool(InstrumentedPool):
+    role = "replica"
+
+
+def engine_options(url: str, config: Settings = settings, *, replica: bool = False) -> dict[str, Any]:
+    """Keyword arguments for ``create_async_engine`` built from the ``db_*`` settings."""
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        # Local development only: keep SQLAlchemy's default pools (NullPool for files, StaticPool in memory).
+        # Pooled aiosqlite connections that are never disposed keep the interpreter from exiting.
+        return {}
+    options: dict[str, Any] = {
+        "poolclass": ReplicaPool if replica else InstrumentedPool,
+        "pool_size": config.db_pool_size,
+        "max_overflow": config.db_max_overflow,
+        "pool_timeout": config.db_pool_timeout,
+        "pool_recycle": config.db_pool_recycle,
+        "pool_pre_ping": config.db_pool_pre_ping,
+    }
+    if url.get_driver_name() == "asyncpg":
+        if config.db_pgbouncer:
+            # PgBouncer in transaction mode hands each transaction a different server connection,
+            # so named server-side statements from one connection must never be reused on another.
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            }
+        else:
+            options["connect_args"] = {"prepared_statement_cache_size": config.db_statement_cache_size}
+    return options
+
 
 engine = create_async_engine(
     settings.database_url,
     echo=False,
+    **engine_options(settings.database_url),
+)
+read_engine: AsyncEngine | None = (
+    create_async_engine(
+        settings.read_database_url,
+        echo=False,
+        **engine_options(settings.read_database_url, replica=True),
+    )
+    if settings.read_database_url
+    else None
+)
+
+
+def _pool_stat(target: AsyncEngine, name: str):
+    def read() -> float:
+        pool = target.pool
+        return getattr(pool, name)() if isinstance(pool, QueuePool) else 0
+
+    return read
+
+
+def _register_sqlite_functions(dbapi_connection, connection_record):
+    from app.search import register_sqlite_functions
+
+    register_sqlite_functions(dbapi_connection)
+
+
+def _track_checkout(dbapi_connection, connection_record, connection_proxy):
+    timings = current_timings()
+    if timings is not None:
+        # Kept on the record: check-in may run outside the request's context.
+        connection_record.info["request_timings"] = timings
+        timings.connection_checked_out(id(connection_record))
+
+
+def _track_checkin(dbapi_connection, connection_record):
+    timings = connection_record.info.pop("request_timings", None)
+    if timings is not None:
+        timings.connection_checked_in(id(connection_record))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    statement_finished(statement, time.perf_counter() - conn.info["query_started"].pop())
+
+
+def _statement_failed(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        statement_finished(exception_context.statement or "", time.perf_counter() - conn.info["query_started"].pop())
+
+
+for _role, _engine in (("primary", engine), ("replica", read_engine)):
+    if _engine is None:
+        continue
+    event.listen(_engine.sync_engine, "checkout", _track_checkout)
+    event.listen(_engine.sync_engine, "checkin", _track_checkin)
+    event.listen(_engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(_engine.sync_engine, "handle_error", _statement_failed)
+    pool_in_use.set_function(_pool_stat(_engine, "checkedout"), role=_role)
+    pool_idle.set_function(_pool_stat(_engine, "checkedin"), role=_role)
+    pool_overflow.set_function(_pool_stat(_engine, "overflow"), role=_role)
+    if _engine.dialect.name == "sqlite":
+        event.listen(_engine.sync_engine, "connect", _register_sqlite_functions)
+
+# Seconds of replay behind the primary; 0 when the replica has replayed everything it received
+# (an idle primary would otherwise look like growing lag).
+REPLICA_LAG_SQL = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+class ReplicaRouter:
+    """Sends catalog reads to the replica only while it is reachable and caught up.
+
+    Health is checked in the background (see ``run``), so routing a request costs nothing.
+    After a catalog write from this process reads stay on the primary for ``max_lag`` seconds,
+    which keeps a lagging replica from refilling the response cache with the old rows. This hold
+    is per process: other workers keep reading the replica, so a write is not guaranteed to be
+    visible to reads served by them until the replica has replayed it.
+    """
+
+    def __init__(self, replica: AsyncEngine | None, max_lag: float, interval: float):
+        self.replica = replica
+        self.max_lag = max_lag
+        self.interval = interval
+        self.healthy = False
+        self._primary_until = 0.0
+
+    async def check(self) -> bool:
+        if self.replica is None:
+            return False
+        try:
+            async with asyncio.timeout(self.interval):
+                async with self.replica.connect() as conn:
+                    if conn.dialect.name == "postgresql":
+                        lag = float(await conn.scalar(REPLICA_LAG_SQL))
+                    else:
+                        await conn.execute(text("SELECT 1"))
+                        lag = 0.0
+        except (OSError, TimeoutError, exc.SQLAlchemyError):
+            self.mark_unavailable()
+            return False
+        replica_lag.set(lag)
+        self.healthy = lag <= self.max_lag
+        replica_healthy.set(int(self.healthy))
+        return self.healthy
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    def mark_unavailable(self) -> None:
+        self.healthy = False
+        replica_healthy.set(0)
+
+    def hold_primary(self) -> None:
+        if self.replica is not None:
+            self._primary_until = time.monotonic() + self.max_lag
+
+    def engine_for_reads(self) -> AsyncEngine:
+        if self.healthy and time.monotonic() >= self._primary_until:
+            return self.replica
+        return engine
+
+
+replica_router = ReplicaRouter(
+    read_engine, settings.replica_max_lag_seconds, settings.replica_check_interval_seconds
 )
 
+# Read-only sessions run in autocommit: no BEGIN/COMMIT/ROLLBACK round trips around their queries.
+_autocommit_engines = {
+    id(target): target.execution_options(isolation_level="AUTOCOMMIT")
+    for target in (engine, read_engine)
+    if target is not None
+}
+
+# Session.info key for tasks started by after-commit hooks that ``commit`` must wait for.
+AFTER_COMMIT_TASKS = "after_commit_tasks"
+
+
+class PrimarySession(AsyncSession):
+    """Session whose ``commit`` returns only once the tasks its after-commit hooks started are done.
+
+    ORM events are synchronous, so e.g. the catalog cache version bump runs as a task; waiting for
+    it here means a request that starts after the write never reads what the write replaced.
+    """
+
+    async def commit(self) -> None:
+        await super().commit()
+        tasks = self.info.pop(AFTER_COMMIT_TASKS, None)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+
 AsyncSessionLocal = async_sessionmaker(
     engine,
-    class_=AsyncSession,
+    class_=PrimarySession,
     expire_on_commit=False,
     autocommit=False,
     autoflush=False,
@@ -30,3 +279,71 @@ async def get_db():
             raise
         finally:
             await session.close()
+
+
+async def get_readonly_db():
+    """Autocommit session on the primary for requests that only read (and must see their own writes)."""
+    async with AsyncSessionLocal(bind=_autocommit_engines[id(engine)]) as session:
+        yield session
+
+
+class ReadSession(AsyncSession):
+    """Autocommit read session that retries a statement once on the primary if the replica fails.
+
+    Only reads go through these sessions, so re-running the failed statement is safe; the session
+    stays on the primary for the rest of the request.
+    """
+
+    def _on_replica(self) -> bool:
+        return read_engine is not None and self.sync_session.bind is _autocommit_engines[id(read_engine)].sync_engine
+
+    async def _fail_over(self) -> None:
+        # Stop routing here until the next successful health check.
+        replica_router.mark_unavailable()
+        replica_failovers.inc()
+        await self.close()
+        primary = _autocommit_engines[id(engine)]
+        self.bind = primary
+        self.sync_session.bind = primary.sync_engine
+
+    async def _retrying(self, method, *args, **kwargs):
+        try:
+            return await method(*args, **kwargs)
+        except CONNECTION_ERRORS:
+            if not self._on_replica():
+                raise
+            await self._fail_over()
+        return await method(*args, **kwargs)
+
+    async def execute(self, *args, **kwargs):
+        return await self._retrying(super().execute, *args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await self._retrying(super().scalar, *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return await self._retrying(super().get, *args, **kwargs)
+
+
+_ReadSessionLocal = async_sessionmaker(class_=ReadSession, expire_on_commit=False, autoflush=False)
+
+
+async def get_read_db():
+    """Read-only session for catalog reads: the replica when it is healthy, otherwise the primary.
+
+    A read that fails on the replica is retried on the primary (see ``ReadSession``). Endpoints
+    that must see their own writes (the cart) use ``get_db`` or ``get_readonly_db``.
+    """
+    bind = replica_router.engine_for_reads()
+    catalog_reads.inc(target="primary" if bind is engine else "replica")
+    async with _ReadSessionLocal(bind=_autocommit_engines[id(bind)]) as session:
+        yield session
+
+
+async def release(session: AsyncSession) -> None:
+    """Return a read-only session's connection to the pool once its rows are loaded.
+
+    Call it before building the response so serialization does not hold a pooled connection.
+    Loaded objects stay readable (``expire_on_commit=False``); a later query checks out a new connection.
+    """
+    await session.close()
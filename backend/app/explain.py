@@ -0,0 +1,26 @@
+import json
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+
+class Explain(Executable, ClauseElement):
+    """``EXPLAIN (FORMAT JSON)`` wrapper that keeps the wrapped statement's bound parameters."""
+
+    inherit_cache = False
+
+    def __init__(self, statement, analyze: bool = False):
+        self.statement = statement
+        self.analyze = analyze
+
+
+@compiles(Explain, "postgresql")
+def _explain_postgresql(element: Explain, compiler, **kw) -> str:
+    options = "ANALYZE, FORMAT JSON" if element.analyze else "FORMAT JSON"
+    return f"EXPLAIN ({options}) " + compiler.process(element.statement, **kw)
+
+
+def plan_root(value) -> dict:
+    """Top plan node from the single JSON row EXPLAIN returns (a string with some drivers)."""
+    if isinstance(value, str):
+        value = json.loads(value)
+    return value[0]["Plan"]
@@ -1,17 +1,38 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import text
 from app.config import settings
-from app.database import engine, Base
+from app import metrics
+from app.auth import password_hasher
+from app.database import engine, read_engine, replica_router
+from app.migrations import init_schema
+from app.sweeper import run_cart_sweeper
+from app.compression import CompressionMiddleware
+from app.ratelimit import RateLimitMiddleware
+from app.timing import RequestMetricsMiddleware
 from app.routers import products, cart, auth
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await init_schema(conn)
+    background = []
+    if read_engine is not None:
+        await replica_router.check()
+        background.append(asyncio.create_task(replica_router.run()))
+    if settings.cart_sweep_interval_seconds > 0:
+        background.append(asyncio.create_task(run_cart_sweeper()))
     yield
+    for task in background:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    if read_engine is not None:
+        await read_engine.dispose()
+    password_hasher.shutdown()
     await engine.dispose()
 
 
@@ -22,14 +43,20 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Inside CORS, so 429 responses still carry the CORS headers the browser needs to read them.
+app.add_middleware(RateLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origins.split(","),
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[cart.CART_TOKEN_HEADER],
 )
 
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
+
 app.include_router(products.router)
 app.include_router(cart.router)
 app.include_router(auth.router)
@@ -38,3 +65,8 @@ app.include_router(auth.router)
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
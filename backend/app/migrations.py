@@ -0,0 +1,128 @@
+"""Schema bootstrap and forward-only migrations.
+
+``create_all`` only creates missing tables, so indexes and columns added to existing tables
+are listed in MIGRATIONS. Each entry runs once, in order, and is recorded in
+``schema_migrations``; on a fresh database everything is created by ``create_all`` and the
+entries are only recorded.
+
+Migrations run inside the startup transaction, so index builds lock writes to the table
+while they run; on a large production table create the index by hand with
+``CREATE INDEX CONCURRENTLY`` first; the ``IF NOT EXISTS`` step then becomes a no-op.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from app.database import Base
+from app import models  # noqa: F401  (registers tables on Base.metadata)
+
+EXTENSIONS = {
+    "postgresql": ["CREATE EXTENSION IF NOT EXISTS pg_trgm"],
+}
+
+# (version, dialect or None for every dialect, statements)
+MIGRATIONS: list[tuple[str, str | None, list[str]]] = [
+    (
+        "0001_products_trgm",
+        "postgresql",
+        [
+            "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops)",
+            "CREATE INDEX IF NOT EXISTS ix_products_description_trgm ON products USING gin (description gin_trgm_ops)",
+        ],
+    ),
+    (
+        "0002_cart_items_unique_product",
+        None,
+        [
+            # Fold duplicate lines into the oldest one before adding the unique index.
+            "UPDATE cart_items SET quantity = (SELECT SUM(d.quantity) FROM cart_items d"
+            " WHERE d.cart_id = cart_items.cart_id AND d.product_id = cart_items.product_id)"
+            " WHERE id IN (SELECT MIN(id) FROM cart_items GROUP BY cart_id, product_id HAVING COUNT(*) > 1)",
+            "DELETE FROM cart_items WHERE id NOT IN (SELECT MIN(id) FROM cart_items GROUP BY cart_id, product_id)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_cart_items_cart_product ON cart_items (cart_id, product_id)",
+        ],
+    ),
+    (
+        "0003_products_sku",
+        None,
+        [
+            "ALTER TABLE products ADD COLUMN sku VARCHAR(64)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_products_sku ON products (sku)",
+        ],
+    ),
+    (
+        "0004_products_listing_indexes",
+        None,
+        [
+            "CREATE INDEX IF NOT EXISTS ix_products_category_id ON products (category, id)",
+            "CREATE INDEX IF NOT EXISTS ix_products_category_price_id ON products (category, price, id)",
+            "CREATE INDEX IF NOT EXISTS ix_products_category_name_id ON products (category, name, id)",
+            "CREATE INDEX IF NOT EXISTS ix_products_price_id ON products (price, id)",
+            "CREATE INDEX IF NOT EXISTS ix_products_name_id ON products (name, id)",
+        ],
+    ),
+    (
+        "0005_users_token_version",
+        None,
+        ["ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0"],
+    ),
+    (
+        "0006_cart_totals",
+        None,
+        [
+            "ALTER TABLE carts ADD COLUMN item_count INTEGER NOT NULL DEFAULT 0",
+            "ALTER TABLE carts ADD COLUMN total NUMERIC(16, 2) NOT NULL DEFAULT 0",
+            "UPDATE carts SET"
+            " item_count = COALESCE((SELECT SUM(quantity) FROM cart_items WHERE cart_id = carts.id), 0),"
+            " total = COALESCE((SELECT SUM(cart_items.quantity * products.price) FROM cart_items"
+            " JOIN products ON products.id = cart_items.product_id WHERE cart_items.cart_id = carts.id), 0)",
+        ],
+    ),
+    (
+        "0007_carts_timestamps",
+        None,
+        [
+            # SQLite cannot add a column with a non-constant default; existing carts start their TTL now.
+            "ALTER TABLE carts ADD COLUMN created_at TIMESTAMP WITH TIME ZONE",
+            "ALTER TABLE carts ADD COLUMN updated_at TIMESTAMP WITH TIME ZONE",
+            "UPDATE carts SET created_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP",
+        ],
+    ),
+    (
+        "0008_carts_timestamps_default",
+        "postgresql",
+        [
+            "ALTER TABLE carts ALTER COLUMN created_at SET DEFAULT now()",
+            "ALTER TABLE carts ALTER COLUMN updated_at SET DEFAULT now()",
+        ],
+    ),
+    (
+        "0009_carts_timestamps_backfill",
+        None,
+        [
+            # Carts created after 0007 without a column default; they start their TTL now.
+            "UPDATE carts SET created_at = COALESCE(created_at, CURRENT_TIMESTAMP),"
+            " updated_at = COALESCE(updated_at, CURRENT_TIMESTAMP)"
+            " WHERE created_at IS NULL OR updated_at IS NULL",
+        ],
+    ),
+]
+
+
+async def init_schema(conn: AsyncConnection) -> None:
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        # Serialize concurrent startups (several uvicorn workers) until the transaction ends.
+        await conn.execute(text("SELECT pg_advisory_xact_lock(727001)"))
+    for statement in EXTENSIONS.get(dialect, []):
+        await conn.execute(text(statement))
+    existing = await conn.run_sync(lambda c: set(inspect(c).get_table_names()))
+    await conn.run_sync(Base.metadata.create_all)
+    await conn.execute(text("CREATE TABLE IF NOT EXISTS schema_migrations (version VARCHAR(64) PRIMARY KEY)"))
+    applied = set((await conn.execute(text("SELECT version FROM schema_migrations"))).scalars())
+    fresh = "products" not in existing
+    for version, only, statements in MIGRATIONS:
+        if version in applied:
+            continue
+        if not fresh and only in (None, dialect):
+            for statement in statements:
+                await conn.execute(text(statement))
+        await conn.execute(text("INSERT INTO schema_migrations (version) VALUES (:v)"), {"v": version})
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Numeric, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, Numeric, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -10,6 +10,8 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String(255), nullable=False, unique=True, index=True)
     hashed_password = Column(String(255), nullable=False)
+    # Embedded in access tokens as "ver"; bumping it revokes every token issued before.
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
@@ -17,6 +19,7 @@ class Product(Base):
     __tablename__ = "products"
 
     id = Column(Integer, primary_key=True, index=True)
+    sku = Column(String(64), nullable=True)
     name = Column(String(255), nullable=False)
     description = Column(Text, nullable=True)
     price = Column(Numeric(12, 2), nullable=False)
@@ -25,12 +28,40 @@ class Product(Base):
 
     cart_items = relationship("CartItem", back_populates="product")
 
+    __table_args__ = (
+        # Natural key for catalog imports (scripts/import_products.py upserts on it).
+        Index("ix_products_sku", "sku", unique=True),
+        # Listing access paths: optional category equality, then the sort key with id as tiebreaker
+        # (also the keyset order); price ranges use the price-leading indexes.
+        Index("ix_products_category_id", "category", "id"),
+        Index("ix_products_category_price_id", "category", "price", "id"),
+        Index("ix_products_category_name_id", "category", "name", "id"),
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_name_id", "name", "id"),
+        # pg_trgm GIN indexes serve the substring ILIKE used by search (see app/search.py).
+        Index(
+            "ix_products_name_trgm", "name",
+            postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_products_description_trgm", "description",
+            postgresql_using="gin", postgresql_ops={"description": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
 
 class Cart(Base):
     __tablename__ = "carts"
 
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String(255), nullable=False, unique=True, index=True)
+    # Denormalized sum(quantity) and sum(quantity * price) of the lines, adjusted by every cart
+    # mutation in its own transaction (see crud.adjust_cart_totals).
+    item_count = Column(Integer, nullable=False, default=0, server_default="0")
+    total = Column(Numeric(16, 2), nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Last mutation; the sweeper (app/sweeper.py) deletes carts left untouched for too long.
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     items = relationship("CartItem", back_populates="cart", cascade="all, delete-orphan")
 
@@ -45,3 +76,8 @@ class CartItem(Base):
 
     cart = relationship("Cart", back_populates="items")
     product = relationship("Product", back_populates="cart_items")
+
+    __table_args__ = (
+        # Conflict target for the add-or-increment upsert in crud.add_cart_item.
+        Index("uq_cart_items_cart_product", "cart_id", "product_id", unique=True),
+    )
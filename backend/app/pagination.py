@@ -0,0 +1,46 @@
+import base64
+import json
+from decimal import Decimal, InvalidOperation
+from typing import Any, NamedTuple
+
+
+class Cursor(NamedTuple):
+    sort_by: str
+    sort_order: str
+    key: Any
+    id: int
+    backwards: bool
+
+
+def encode_cursor(sort_by: str, sort_order: str, key: Any, id: int, backwards: bool = False) -> str:
+    if isinstance(key, Decimal):
+        key = str(key)
+    payload = {"s": sort_by, "o": sort_order, "k": key, "i": id, "b": int(backwards)}
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Cursor:
+    """Parse a cursor produced by encode_cursor; raises ValueError on any malformed input."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        sort_by, sort_order, key, id_ = payload["s"], payload["o"], payload["k"], payload["i"]
+        backwards = bool(payload.get("b", 0))
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(id_, int) or sort_order not in ("asc", "desc"):
+        raise ValueError("Invalid cursor")
+    if sort_by == "id":
+        key = id_
+    elif sort_by == "name":
+        if not isinstance(key, str):
+            raise ValueError("Invalid cursor")
+    elif sort_by == "price":
+        try:
+            key = Decimal(str(key))
+        except InvalidOperation as e:
+            raise ValueError("Invalid cursor") from e
+    else:
+        raise ValueError("Invalid cursor")
+    return Cursor(sort_by, sort_order, key, id_, backwards)
@@ -0,0 +1,201 @@
+"""Token-bucket rate limiting.
+
+Two layers share one bucket store:
+
+* ``RateLimitMiddleware`` limits every request per client IP to ``rate_limit_rps`` with bursts of
+  ``rate_limit_burst``, before routing and before any database work.
+* ``RateLimit`` instances are route dependencies declared next to the routers, with their own rate,
+  burst, key (client IP, ``X-Session-ID`` or user id) and optional per-request cost, e.g. searches
+  cost more than plain listing pages.
+
+A limited request gets 429 with ``Retry-After``. Buckets live in this process (``LocalBuckets``,
+bounded, least recently used evicted first) or in Redis (``RedisBuckets``) so all workers share
+them; ``rate_limit_backend=none`` disables limiting. Client IPs come from the ASGI scope; behind a
+proxy run uvicorn with ``--proxy-headers --forwarded-allow-ips`` so that is the real client.
+"""
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Protocol
+from fastapi import HTTPException
+from starlette.requests import HTTPConnection
+from starlette.responses import JSONResponse
+from app.auth import decode_access_token_claims, token_cache
+from app.config import settings
+from app.metrics import Counter
+
+rate_limited = Counter("rate_limited_requests_total", "Requests rejected with 429 by limit.", ("limit",))
+
+# Paths never limited by the middleware (probes and scrapes).
+EXEMPT_PATHS = frozenset({"/health", "/metrics"})
+
+
+class BucketStore(Protocol):
+    async def take(self, key: str, rate: float, burst: int, cost: float = 1.0) -> float:
+        """Take ``cost`` tokens; returns 0 if allowed, else the seconds until they are available."""
+        ...
+
+
+class LocalBuckets:
+    """In-process buckets: an LRU of ``key -> (tokens, updated_at)``, at most ``max_keys`` entries.
+
+    A bucket left alone long enough refills to ``burst``, which is the same as having no entry, so
+    evicting the least recently used key loses (almost) nothing. OrderedDict keeps eviction O(1)
+    even under a flood of new keys (a plain dict degrades as deleted slots pile up at its front).
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: int, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        entry = self._buckets.get(key)
+        tokens = burst if entry is None else min(burst, entry[0] + (now - entry[1]) * rate)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+# KEYS[1] bucket; ARGV rate, burst, cost. Uses the server clock so every worker agrees on time.
+TAKE_SCRIPT = """
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+if tokens == nil then
+  tokens = burst
+else
+  tokens = math.min(burst, tokens + (now - tonumber(state[2])) * rate)
+end
+local wait = 0
+if tokens >= cost then
+  tokens = tokens - cost
+else
+  wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    """Buckets shared by all workers, updated atomically by a Lua script (one round trip per check)."""
+
+    def __init__(self, client: Any, prefix: str = "catalog-api:ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+        self._take = client.register_script(TAKE_SCRIPT)
+
+    async def take(self, key: str, rate: float, burst: int, cost: float = 1.0) -> float:
+        return float(await self._take(keys=[self.prefix + key], args=[rate, burst, cost]))
+
+
+def make_store(name: str) -> BucketStore | None:
+    if name == "redis":
+        import redis.asyncio as redis
+
+        return RedisBuckets(redis.from_url(settings.redis_url))
+    if name == "none":
+        return None
+    return LocalBuckets(settings.rate_limit_max_keys)
+
+
+store = make_store(settings.rate_limit_backend)
+
+
+def client_ip(conn: HTTPConnection) -> str:
+    return conn.client.host if conn.client else "unknown"
+
+
+def session_or_ip(conn: HTTPConnection) -> str:
+    session_id = conn.headers.get("x-session-id")
+    return f"s:{session_id}" if session_id else client_ip(conn)
+
+
+def user_or_ip(conn: HTTPConnection) -> str:
+    """Signed-in user id (from a valid bearer token), else the client IP."""
+    scheme, _, token = conn.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        cached = token_cache.get(token)
+        if cached is not None:
+            return f"u:{cached[0]}"
+        claims = decode_access_token_claims(token)
+        if claims and claims.get("sub") is not None:
+            return f"u:{claims['sub']}"
+    return client_ip(conn)
+
+
+def too_many_requests(wait: float) -> dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(wait)))}
+
+
+class RateLimit:
+    """Route dependency: ``dependencies=[Depends(RateLimit("login", rate=0.2, burst=5))]``.
+
+    ``rate`` is tokens per second, ``burst`` the bucket size; ``cost`` may weigh requests by
+    their parameters. Declare it before other dependencies so rejected requests never take a
+    database connection.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        rate: float,
+        burst: int,
+        key: Callable[[HTTPConnection], str] = client_ip,
+        cost: Callable[[HTTPConnection], float] | None = None,
+    ):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.key = key
+        self.cost = cost
+
+    async def __call__(self, conn: HTTPConnection) -> None:
+        await self.take(conn, self.cost(conn) if self.cost is not None else 1.0)
+
+    async def take(self, conn: HTTPConnection, cost: float = 1.0) -> None:
+        """Charge ``cost`` tokens to ``conn``'s bucket or raise 429, for costs that depend on the body."""
+        if store is None:
+            return
+        wait = await store.take(f"{self.name}:{self.key(conn)}", self.rate, self.burst, cost)
+        if wait > 0:
+            rate_limited.inc(limit=self.name)
+            raise HTTPException(status_code=429, detail="Too many requests", headers=too_many_requests(wait))
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware applying the default per-IP limit to every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or store is None or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        client = scope.get("client")
+        key = f"default:{client[0] if client else 'unknown'}"
+        wait = await store.take(key, settings.rate_limit_rps, settings.rate_limit_burst)
+        if wait > 0:
+            rate_limited.inc(limit="default")
+            response = JSONResponse(
+                {"detail": "Too many requests"}, status_code=429, headers=too_many_requests(wait)
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
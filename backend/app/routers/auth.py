@@ -1,14 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials, OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
 from app.database import get_db
-from app import crud
-from app.auth import hash_password, verify_password, create_access_token, decode_access_token
+from app import cart_token, crud
+from app.auth import (
+    PasswordHasherBusy,
+    create_access_token,
+    decode_access_token_claims,
+    password_hasher,
+    token_cache,
+)
+from app.ratelimit import RateLimit, user_or_ip
+from app.routers import cart
 from app.schemas import UserCreate, UserResponse, Token
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 security = HTTPBearer(auto_error=False)
 
+# Per client IP: each attempt costs a bcrypt hash. A few tries at once, then one every few seconds.
+login_limit = RateLimit("login", rate=settings.rate_limit_login_rps, burst=settings.rate_limit_login_burst)
+register_limit = RateLimit("register", rate=settings.rate_limit_register_rps, burst=settings.rate_limit_register_burst)
+revoke_limit = RateLimit(
+    "revoke", rate=settings.rate_limit_revoke_rps, burst=settings.rate_limit_revoke_burst, key=user_or_ip
+)
+
 
 async def get_current_user_id(
     credentials: HTTPAuthorizationCredentials | None = Depends(security),
@@ -16,15 +32,30 @@ async def get_current_user_id(
 ) -> int | None:
     if not credentials or credentials.credentials is None:
         return None
-    user_id = decode_access_token(credentials.credentials)
-    if not user_id:
+    token = credentials.credentials
+    claims = decode_access_token_claims(token)
+    if not claims or claims.get("sub") is None:
         return None
     try:
-        uid = int(user_id)
-    except ValueError:
+        uid = int(claims["sub"])
+        version = int(claims.get("ver", 0))
+    except (TypeError, ValueError):
+        return None
+    if version < token_cache.revoked_before(uid):
         return None
+    if token_cache.get(token) is not None:
+        return uid
     user = await crud.get_user_by_id(db, uid)
-    return uid if user else None
+    if not user or user.token_version != version:
+        return None
+    token_cache.put(token, uid, version, claims["exp"])
+    return uid
+
+
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503, detail="Too many concurrent sign-ins, retry shortly", headers={"Retry-After": "1"}
+    )
 
 
 def require_current_user(user_id: int | None = Depends(get_current_user_id)) -> int:
@@ -33,7 +64,7 @@ def require_current_user(user_id: int | None = Depends(get_current_user_id)) ->
     return user_id
 
 
-@router.post("/register", response_model=UserResponse)
+@router.post("/register", response_model=UserResponse, dependencies=[Depends(register_limit)])
 async def register(
     body: UserCreate,
     db: AsyncSession = Depends(get_db),
@@ -41,20 +72,38 @@ async def register(
     existing = await crud.get_user_by_email(db, body.email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
-    user = await crud.create_user(db, body.email, hash_password(body.password))
+    try:
+        hashed = await password_hasher.hash(body.password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+    user = await crud.create_user(db, body.email, hashed)
     await db.refresh(user)
     return user
 
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(login_limit)])
 async def login(
+    response: Response,
     form: OAuth2PasswordRequestForm = Depends(),
+    session_id: str | None = Header(None, alias=cart.SESSION_HEADER),
+    cart_lines: dict[int, int] | None = Depends(cart.get_cart_token),
     db: AsyncSession = Depends(get_db),
 ):
     user = await crud.get_user_by_email(db, form.username)
-    if not user or not verify_password(form.password, user.hashed_password):
+    try:
+        valid = user is not None and await password_hasher.verify(form.password, user.hashed_password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
-    return Token(access_token=create_access_token(user.id))
+    if cart_lines and session_id:
+        # Token mode: a signed-in user's cart lives in the database. A cart already persisted for
+        # the session is newer than any token (none are issued once it exists), so it is kept.
+        if await crud.lock_cart(db, session_id) is None:
+            await crud.save_token_cart(db, session_id, cart_lines)
+            cart_token.cart_tokens_persisted.inc(reason="login")
+        response.headers[cart.CART_TOKEN_HEADER] = ""
+    return Token(access_token=create_access_token(user.id, user.token_version))
 
 
 @router.get("/me", response_model=UserResponse)
@@ -66,3 +115,16 @@ async def me(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
+
+
+@router.post("/revoke", status_code=204, dependencies=[Depends(revoke_limit)])
+async def revoke_tokens(
+    user_id: int = Depends(require_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Invalidate every access token issued to the current user so far."""
+    version = await crud.bump_token_version(db, user_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    token_cache.revoke(user_id, version)
+    return Response(status_code=204)
@@ -1,13 +1,23 @@
 from decimal import Decimal
-from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_db
-from app import crud
-from app.schemas import CartItemAdd, CartItemUpdate, CartResponse
+from app.config import settings
+from app.database import get_db, get_readonly_db, release
+from app import cart_token, crud
+from app.ratelimit import RateLimit, session_or_ip
+from app.schemas import CartBatch, CartItemAdd, CartItemUpdate, CartResponse, CartSummary
 
 router = APIRouter(prefix="/api/cart", tags=["cart"])
 
 SESSION_HEADER = "X-Session-ID"
+# Token mode: the client sends its cart token back in this header and replaces it with the one in
+# the response; an empty response value means the cart now lives in the database.
+CART_TOKEN_HEADER = "X-Cart-Token"
+
+# Cart writes per session (or IP without one); reads are covered by the default per-IP limit.
+cart_write_limit = RateLimit(
+    "cart", rate=settings.rate_limit_cart_rps, burst=settings.rate_limit_cart_burst, key=session_or_ip
+)
 
 
 def get_session_id(x_session_id: str | None = Header(None, alias=SESSION_HEADER)) -> str:
@@ -16,62 +26,184 @@ def get_session_id(x_session_id: str | None = Header(None, alias=SESSION_HEADER)
     return x_session_id
 
 
-@router.post("/")
+def get_cart_token(
+    x_cart_token: str | None = Header(None, alias=CART_TOKEN_HEADER),
+    x_session_id: str | None = Header(None, alias=SESSION_HEADER),
+) -> dict[int, int] | None:
+    """Lines of a valid cart token for this session in token mode; None means the cart (if any) is server-side."""
+    if not cart_token.enabled() or x_cart_token is None or not x_session_id:
+        return None
+    return cart_token.decode(x_cart_token, x_session_id)
+
+
+def _drop_token(lines: dict[int, int] | None, response: Response) -> None:
+    """Tell a client still sending a token that its cart lives in the database.
+
+    Tokens are only issued while the session has no server-side cart, so once one exists any
+    token the client holds is stale and must not override it.
+    """
+    if lines is not None:
+        response.headers[CART_TOKEN_HEADER] = ""
+
+
+async def _writable_cart(
+    db: AsyncSession, session_id: str, lines: dict[int, int] | None, response: Response
+) -> tuple[int | None, dict[int, int] | None]:
+    """``(cart_id, None)`` for a server-side cart (created if needed) or ``(None, lines)`` for a client-held one."""
+    if not cart_token.enabled():
+        return await crud.ensure_cart(db, session_id), None
+    cart_id = await crud.lock_cart(db, session_id)
+    if cart_id is None:
+        return None, lines if lines is not None else {}
+    _drop_token(lines, response)
+    return cart_id, None
+
+
+async def _token_response(
+    db: AsyncSession, session_id: str, lines: dict[int, int], cart: dict, response: Response
+) -> dict:
+    """Hand the cart back as a token, or write it to the database once it outgrows one."""
+    if len(lines) <= settings.cart_token_max_lines:
+        response.headers[CART_TOKEN_HEADER] = cart_token.encode(session_id, lines)
+        return cart
+    cart_id = await crud.save_token_cart(db, session_id, lines)
+    cart_token.cart_tokens_persisted.inc(reason="size")
+    response.headers[CART_TOKEN_HEADER] = ""
+    return await crud.load_cart(db, cart_id=cart_id)
+
+
+@router.post("/", dependencies=[Depends(cart_write_limit)])
 async def add_to_cart(
     body: CartItemAdd,
+    response: Response,
     session_id: str = Depends(get_session_id),
+    token_lines: dict[int, int] | None = Depends(get_cart_token),
     db: AsyncSession = Depends(get_db),
 ):
-    cart = await crud.get_or_create_cart(db, session_id)
-    item = await crud.add_cart_item(db, cart.id, body.product_id, body.quantity)
-    if item is None:
+    cart_id, lines = await _writable_cart(db, session_id, token_lines, response)
+    if lines is not None:
+        lines[body.product_id] = lines.get(body.product_id, 0) + body.quantity
+        cart = await crud.load_token_cart(db, lines)
+        if body.product_id not in lines:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return await _token_response(db, session_id, lines, cart, response)
+    if await crud.add_cart_item(db, cart_id, body.product_id, body.quantity) is None:
         raise HTTPException(status_code=404, detail="Product not found")
-    cart = await crud.get_cart_with_items(db, cart.id)
-    return crud.cart_to_response(cart)
+    return await crud.load_cart(db, cart_id=cart_id)
+
+
+@router.post("/batch", response_model=CartResponse, dependencies=[Depends(cart_write_limit)])
+async def apply_cart_batch(
+    body: CartBatch,
+    response: Response,
+    session_id: str = Depends(get_session_id),
+    token_lines: dict[int, int] | None = Depends(get_cart_token),
+    db: AsyncSession = Depends(get_db),
+):
+    """Apply add / set / remove operations (in order, by product id) in one transaction."""
+    cart_id, lines = await _writable_cart(db, session_id, token_lines, response)
+    if lines is not None:
+        state = crud.fold_cart_operations(body.operations)
+        for product_id, (kind, quantity) in state.items():
+            if kind == "remove":
+                lines.pop(product_id, None)
+            else:
+                lines[product_id] = quantity + (lines.get(product_id, 0) if kind == "add" else 0)
+        cart = await crud.load_token_cart(db, lines)
+        missing = [pid for pid, (kind, _) in state.items() if kind != "remove" and pid not in lines]
+        if missing:
+            raise HTTPException(status_code=404, detail={"message": "Products not found", "product_ids": missing})
+        return CartResponse(**await _token_response(db, session_id, lines, cart, response))
+    missing = await crud.apply_cart_operations(db, cart_id, body.operations)
+    if missing:
+        raise HTTPException(status_code=404, detail={"message": "Products not found", "product_ids": missing})
+    return CartResponse(**await crud.load_cart(db, cart_id=cart_id))
 
 
 @router.get("/", response_model=CartResponse)
 async def get_cart(
+    response: Response,
     session_id: str = Depends(get_session_id),
-    db: AsyncSession = Depends(get_db),
+    token_lines: dict[int, int] | None = Depends(get_cart_token),
+    db: AsyncSession = Depends(get_readonly_db),
+):
+    cart = await crud.load_cart(db, session_id=session_id)
+    if cart:
+        await release(db)
+        _drop_token(token_lines, response)
+        return CartResponse(**cart)
+    if token_lines is not None:
+        issued = len(token_lines)
+        cart = await crud.load_token_cart(db, token_lines)
+        await release(db)
+        if len(token_lines) != issued:
+            # Lines of deleted products were dropped.
+            response.headers[CART_TOKEN_HEADER] = cart_token.encode(session_id, token_lines)
+        return CartResponse(**cart)
+    await release(db)
+    return CartResponse(id=0, items=[], item_count=0, total=Decimal("0"))
+
+
+@router.get("/summary", response_model=CartSummary)
+async def get_cart_summary(
+    response: Response,
+    session_id: str = Depends(get_session_id),
+    token_lines: dict[int, int] | None = Depends(get_cart_token),
+    db: AsyncSession = Depends(get_readonly_db),
 ):
-    cart = await crud.get_cart_by_session(db, session_id)
-    if not cart:
-        return CartResponse(id=0, items=[], total=Decimal("0"))
-    cart = await crud.get_cart_with_items(db, cart.id)
-    return CartResponse(**crud.cart_to_response(cart))
+    """Item count and total for the header badge, read from the cart row without loading lines."""
+    summary = await crud.get_cart_summary(db, session_id)
+    if summary is not None:
+        await release(db)
+        _drop_token(token_lines, response)
+        return CartSummary(id=summary.id, item_count=summary.item_count, total=summary.total)
+    if token_lines is not None:
+        cart = await crud.load_token_cart(db, token_lines)
+        await release(db)
+        return CartSummary(id=0, item_count=cart["item_count"], total=cart["total"])
+    await release(db)
+    return CartSummary(id=0, item_count=0, total=Decimal("0"))
 
 
-@router.put("/{item_id}/")
+@router.put("/{item_id}/", dependencies=[Depends(cart_write_limit)])
 async def update_cart_item(
     item_id: int,
     body: CartItemUpdate,
+    response: Response,
     session_id: str = Depends(get_session_id),
+    token_lines: dict[int, int] | None = Depends(get_cart_token),
     db: AsyncSession = Depends(get_db),
 ):
-    cart = await crud.get_cart_by_session(db, session_id)
-    if not cart:
-        raise HTTPException(status_code=404, detail="Cart not found")
-    item = await crud.get_cart_item(db, item_id, cart.id)
-    if not item:
+    if token_lines is not None:
+        _, token_lines = await _writable_cart(db, session_id, token_lines, response)
+    if token_lines is not None:
+        if item_id not in token_lines:
+            raise HTTPException(status_code=404, detail="Cart item not found")
+        token_lines[item_id] = body.quantity
+        cart = await crud.load_token_cart(db, token_lines)
+        return await _token_response(db, session_id, token_lines, cart, response)
+    cart_id = await crud.set_cart_item_quantity(db, session_id, item_id, body.quantity)
+    if cart_id is None:
         raise HTTPException(status_code=404, detail="Cart item not found")
-    await crud.update_cart_item_quantity(db, item, body.quantity)
-    cart = await crud.get_cart_with_items(db, cart.id)
-    return crud.cart_to_response(cart)
+    return await crud.load_cart(db, cart_id=cart_id)
 
 
-@router.delete("/{item_id}/")
+@router.delete("/{item_id}/", dependencies=[Depends(cart_write_limit)])
 async def delete_cart_item(
     item_id: int,
+    response: Response,
     session_id: str = Depends(get_session_id),
+    token_lines: dict[int, int] | None = Depends(get_cart_token),
     db: AsyncSession = Depends(get_db),
 ):
-    cart = await crud.get_cart_by_session(db, session_id)
-    if not cart:
-        raise HTTPException(status_code=404, detail="Cart not found")
-    item = await crud.get_cart_item(db, item_id, cart.id)
-    if not item:
+    if token_lines is not None:
+        _, token_lines = await _writable_cart(db, session_id, token_lines, response)
+    if token_lines is not None:
+        if token_lines.pop(item_id, None) is None:
+            raise HTTPException(status_code=404, detail="Cart item not found")
+        cart = await crud.load_token_cart(db, token_lines)
+        return await _token_response(db, session_id, token_lines, cart, response)
+    cart_id = await crud.remove_cart_item(db, session_id, item_id)
+    if cart_id is None:
         raise HTTPException(status_code=404, detail="Cart item not found")
-    await crud.delete_cart_item(db, item)
-    cart = await crud.get_cart_with_items(db, cart.id)
-    return crud.cart_to_response(cart)
+    return await crud.load_cart(db, cart_id=cart_id)
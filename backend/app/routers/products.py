@@ -1,21 +1,153 @@
+import json
 from decimal import Decimal
+from typing import Awaitable, Callable
 from urllib.parse import urlencode
-from fastapi import APIRouter, Depends, Query, HTTPException, Request
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_db
+from starlette.requests import HTTPConnection
+from app.database import catalog_reads, engine, get_read_db, release, replica_router
 from app import crud
-from app.schemas import ProductListResponse, ProductDetailResponse, ProductsPaginatedResponse
+from app.cache import SingleFlight, VersionedSnapshot, etag_matches, response_cache
+from app.compression import accepts, add_vary, compress, negotiate
+from app.export import EXPORT_COLUMNS, MEDIA_TYPES, stream_export
+from app.config import settings
+from app.pagination import Cursor, decode_cursor, encode_cursor
+from app.ratelimit import RateLimit
+from app.serialization import dumps
+from app.schemas import (
+    ProductBulkRequest,
+    ProductBulkResponse,
+    ProductDetailResponse,
+    ProductFacetsResponse,
+    ProductsPaginatedResponse,
+)
 
 router = APIRouter(prefix="/api/products", tags=["products"])
 
 
-def _paginated_url(request: Request, offset: int, **extra) -> str | None:
-    params = dict[str, str](request.query_params)
-    params["offset"] = offset
-    params.update(extra)
+def _catalog_cost(conn: HTTPConnection) -> float:
+    # Searches miss the response cache far more often and scan the trigram indexes.
+    return 5.0 if conn.query_params.get("search") else 1.0
+
+
+# Per client IP. Listing, facets and bulk lookups share a bucket; exports stream the whole catalog.
+catalog_limit = RateLimit(
+    "catalog", rate=settings.rate_limit_catalog_rps, burst=settings.rate_limit_catalog_burst, cost=_catalog_cost
+)
+export_limit = RateLimit("export", rate=settings.rate_limit_export_rps, burst=settings.rate_limit_export_burst)
+# Bulk lookups draw on the catalog bucket by size: a full batch of ids costs as much as a search.
+BULK_IDS_PER_TOKEN = 20
+
+
+async def bulk_limit(conn: HTTPConnection, body: ProductBulkRequest) -> None:
+    await catalog_limit.take(conn, max(1.0, len(set(body.ids)) / BULK_IDS_PER_TOKEN))
+
+
+# Grouped facet rows of the whole catalog; serves every facets request without search or price filters.
+_catalog_facets = VersionedSnapshot(response_cache)
+# Cache misses in flight, by entry key: a burst of identical requests builds the body once.
+_builds = SingleFlight()
+
+
+# Values list_products falls back to; pagination links leave them out.
+_LIST_DEFAULTS = {"sort_by": "id", "sort_order": "asc", "count": "exact"}
+
+
+def _link_params(filters: dict, limit: int) -> dict:
+    """Query parameters of a pagination link, from the normalized filters of the request.
+
+    Links are cached with the page, so they must not depend on how the request that filled the
+    entry spelled or ordered its parameters.
+    """
+    params = {name: value for name, value in filters.items() if value is not None and value != _LIST_DEFAULTS.get(name)}
+    params["limit"] = limit
+    return params
+
+
+def _paginated_url(request: Request, filters: dict, limit: int, offset: int) -> str:
+    params = dict(_link_params(filters, limit), offset=offset)
+    return str(request.url.replace(query=urlencode(params)))
+
+
+def _cursor_url(request: Request, filters: dict, limit: int, cursor: str) -> str:
+    params = dict(_link_params(filters, limit), pagination="cursor", cursor=cursor)
     return str(request.url.replace(query=urlencode(params)))
 
 
+def _cache_headers(etag: str) -> dict[str, str]:
+    headers = {"ETag": etag}
+    if settings.catalog_cache_control:
+        headers["Cache-Control"] = settings.catalog_cache_control
+    if settings.catalog_vary:
+        headers["Vary"] = settings.catalog_vary
+    return headers
+
+
+def _encoded_response(body: bytes, encoding: str, headers: dict[str, str]) -> Response:
+    response = Response(content=body, media_type="application/json", headers=headers)
+    response.headers["Content-Encoding"] = encoding
+    add_vary(response.headers)
+    return response
+
+
+def _encoded_etag(etag: str, encoding: str) -> str:
+    return etag[:-1] + f'-{encoding}"'
+
+
+async def _cached_response(
+    request: Request, namespace: str, key: str, build: Callable[[], Awaitable[bytes]]
+) -> Response:
+    """Serve a catalog body from the response cache, building and storing it on a miss.
+
+    With compression negotiated, the encoded body is cached next to the raw one under
+    ``<key>:<encoding>`` (empty when the body is below ``compression_min_size``), so a hot entry
+    is compressed once per catalog version. The ETag is stored with the entry; encoded
+    representations get their own, derived from it. A cached entry answers ``If-None-Match``
+    without touching the database; on a miss the body is built first, so the tag is never stale.
+    Concurrent misses for the same key share one ``build`` (see ``SingleFlight``).
+    """
+    encoding = negotiate(request.headers.get("accept-encoding"))
+    if_none_match = request.headers.get("if-none-match")
+
+    def not_modified(etag: str) -> Response | None:
+        for tag in [etag] + ([_encoded_etag(etag, encoding)] if encoding else []):
+            if etag_matches(if_none_match, tag):
+                return Response(status_code=304, headers=_cache_headers(tag))
+        return None
+
+    encoded_entry = None
+    if encoding:
+        encoded_entry = await response_cache.get(f"{namespace}:{encoding}", f"{key}:{encoding}")
+        if encoded_entry is not None and encoded_entry[1]:
+            etag, encoded = encoded_entry
+            return not_modified(etag) or _encoded_response(
+                encoded, encoding, _cache_headers(_encoded_etag(etag, encoding))
+            )
+    entry = await response_cache.get(namespace, key)
+    if entry is None:
+
+        async def build_and_store() -> tuple[str, bytes]:
+            built = await build()
+            return await response_cache.set(key, built), built
+
+        entry = await _builds.do(namespace, key, build_and_store)
+    etag, body = entry
+    response = not_modified(etag)
+    if response is not None:
+        return response
+    if encoding and encoded_entry is None:
+        if len(body) >= settings.compression_min_size:
+            encoded = compress(body, encoding)
+            await response_cache.set(f"{key}:{encoding}", encoded, etag)
+            return _encoded_response(encoded, encoding, _cache_headers(_encoded_etag(etag, encoding)))
+        await response_cache.set(f"{key}:{encoding}", b"", etag)
+    response = Response(content=body, media_type="application/json", headers=_cache_headers(etag))
+    if settings.compression_enabled:
+        add_vary(response.headers)
+    return response
+
+
 def _optional_decimal(v: str | None) -> Decimal | None:
     if v is None or (isinstance(v, str) and v.strip() == ""):
         return None
@@ -26,52 +158,256 @@ def _optional_decimal(v: str | None) -> Decimal | None:
         return None
 
 
-@router.get("/", response_model=ProductsPaginatedResponse)
+_LIST_FIELDS = tuple(column.key for column in crud.PRODUCT_LIST_COLUMNS)
+# Filters the total depends on (not the sort or the page).
+_COUNT_KEYS = ("category", "min_price", "max_price", "search")
+
+
+def _page_body(total: int | None, next_url: str | None, previous_url: str | None, rows: list) -> bytes:
+    """``ProductsPaginatedResponse`` JSON built straight from ``PRODUCT_LIST_COLUMNS`` rows."""
+    return dumps(
+        {
+            "count": total,
+            "next": next_url,
+            "previous": previous_url,
+            "results": [dict(zip(_LIST_FIELDS, row)) for row in rows],
+        }
+    )
+
+
+async def _get_products(db: AsyncSession, filters: dict, **page) -> tuple[list, int | None]:
+    """List rows via ``crud.get_products``, with exact totals cached per filter set.
+
+    The total does not depend on the page or the sort order, so one COUNT serves every page of
+    a filter set until the catalog version changes or the entry expires.
+    """
+    columns = crud.PRODUCT_LIST_COLUMNS
+    if filters["count"] != "exact":
+        return await crud.get_products(db, columns=columns, **page, **filters)
+    key = await response_cache.entry_key("products:count", {name: filters[name] for name in _COUNT_KEYS})
+    entry = await response_cache.get("products:count", key)
+    if entry is not None:
+        products, _ = await crud.get_products(db, columns=columns, **page, **dict(filters, count="none"))
+        return products, int(entry[1])
+    products, total = await crud.get_products(db, columns=columns, **page, **filters)
+    await response_cache.set(key, str(total).encode())
+    return products, total
+
+
+async def _cursor_page(
+    request: Request, db: AsyncSession, limit: int, position: Cursor | None, filters: dict
+) -> bytes:
+    sort_by, sort_order = filters["sort_by"], filters["sort_order"]
+    backwards = position is not None and position.backwards
+    products, total = await _get_products(
+        db, filters, limit=limit + 1, keyset=(position.key, position.id) if position else None, backwards=backwards
+    )
+    await release(db)
+    has_more = len(products) > limit
+    products = products[-limit:] if backwards else products[:limit]
+    has_next = has_more if not backwards else bool(products)
+    has_previous = has_more if backwards else position is not None and bool(products)
+    first, last = (products[0], products[-1]) if products else (None, None)
+    next_url = (
+        _cursor_url(request, filters, limit, encode_cursor(sort_by, sort_order, getattr(last, sort_by), last.id))
+        if has_next
+        else None
+    )
+    previous_cursor = (
+        encode_cursor(sort_by, sort_order, getattr(first, sort_by), first.id, backwards=True) if has_previous else None
+    )
+    previous_url = _cursor_url(request, filters, limit, previous_cursor) if previous_cursor else None
+    return _page_body(total, next_url, previous_url, products)
+
+
+async def _offset_page(
+    request: Request, db: AsyncSession, limit: int, offset: int, filters: dict
+) -> bytes:
+    if filters["count"] == "exact":
+        products, total = await _get_products(db, filters, limit=limit, offset=offset)
+        has_next = offset + limit < total
+    else:
+        # Without an exact total, fetch one extra row to learn whether a next page exists.
+        products, total = await _get_products(db, filters, limit=limit + 1, offset=offset)
+        has_next = len(products) > limit
+        products = products[:limit]
+    await release(db)
+    next_url = _paginated_url(request, filters, limit, offset + limit) if has_next else None
+    previous_url = _paginated_url(request, filters, limit, max(0, offset - limit)) if offset > 0 else None
+    return _page_body(total, next_url, previous_url, products)
+
+
+@router.get("/", response_model=ProductsPaginatedResponse, dependencies=[Depends(catalog_limit)])
 async def list_products(
     request: Request,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
     category: str | None = Query(None),
     min_price: str | None = Query(None),
     max_price: str | None = Query(None),
     search: str | None = Query(None),
-    sort_by: str = Query("id", description="Sort field: id, name, price"),
+    sort_by: str = Query("id", description="Sort field: id, name, price, relevance (with search, best match first)"),
     sort_order: str = Query("asc", description="Sort order: asc, desc"),
+    pagination: str = Query("offset", description="Pagination mode: offset, cursor"),
+    cursor: str | None = Query(None, description="Opaque cursor from next/previous in cursor mode"),
+    count: str = Query("exact", description="Total count: exact, estimate (planner estimate), none (count is null)"),
 ):
-    if sort_by not in ("id", "name", "price"):
+    min_p = _optional_decimal(min_price)
+    max_p = _optional_decimal(max_price)
+    cat = (category or "").strip() or None
+    q = (search or "").strip() or None
+    if sort_by == "relevance" and q:
+        sort_order = "desc"
+    elif sort_by not in ("id", "name", "price"):
         sort_by = "id"
+    sort_order = "desc" if sort_order.lower() == "desc" else "asc"
+    if count not in ("exact", "estimate", "none"):
+        count = "exact"
+    filters = dict(
+        category=cat, min_price=min_p, max_price=max_p, search=q, sort_by=sort_by, sort_order=sort_order, count=count
+    )
+
+    keyset_mode = bool(cursor) or pagination == "cursor"
+    position = None
+    if keyset_mode:
+        if sort_by == "relevance":
+            raise HTTPException(status_code=400, detail="Cursor pagination is not supported for sort_by=relevance")
+        if cursor:
+            try:
+                position = decode_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            if (position.sort_by, position.sort_order) != (sort_by, sort_order):
+                raise HTTPException(status_code=400, detail="Cursor does not match sort parameters")
+
+    params = dict(filters, base=str(request.base_url), limit=limit)
+    if keyset_mode:
+        params["cursor"] = cursor or ""
+    else:
+        params["offset"] = offset
+    key = await response_cache.entry_key("products:list", params)
+    if keyset_mode:
+        return await _cached_response(
+            request, "products:list", key, lambda: _cursor_page(request, db, limit, position, filters)
+        )
+    return await _cached_response(
+        request, "products:list", key, lambda: _offset_page(request, db, limit, offset, filters)
+    )
+
+
+@router.get("/facets", response_model=ProductFacetsResponse, dependencies=[Depends(catalog_limit)])
+async def product_facets(
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    category: str | None = Query(None),
+    min_price: str | None = Query(None),
+    max_price: str | None = Query(None),
+    search: str | None = Query(None),
+):
+    """Category counts and price buckets for the same filters as the product list."""
     min_p = _optional_decimal(min_price)
     max_p = _optional_decimal(max_price)
     cat = (category or "").strip() or None
     q = (search or "").strip() or None
-    products, total = await crud.get_products(
-        db,
-        limit=limit,
-        offset=offset,
-        category=cat,
-        min_price=min_p,
-        max_price=max_p,
+
+    key = await response_cache.entry_key(
+        "products:facets", dict(category=cat, min_price=min_p, max_price=max_p, search=q)
+    )
+
+    async def build() -> bytes:
+        if q is None and min_p is None and max_p is None:
+            rows = await _catalog_facets.get(lambda: crud.get_facet_rows(db))
+        else:
+            rows = await crud.get_facet_rows(db, min_price=min_p, max_price=max_p, search=q)
+        await release(db)
+        return ProductFacetsResponse(**crud.fold_facets(rows, cat)).model_dump_json().encode()
+
+    return await _cached_response(request, "products:facets", key, build)
+
+
+@router.get("/export", response_class=StreamingResponse, dependencies=[Depends(export_limit)])
+async def export_products(
+    request: Request,
+    format: str = Query("ndjson", description="Output format: ndjson, csv"),
+    category: str | None = Query(None),
+    min_price: str | None = Query(None),
+    max_price: str | None = Query(None),
+    search: str | None = Query(None),
+    sort_by: str = Query("id", description="Sort field: id, name, price, relevance (with search)"),
+    sort_order: str = Query("asc", description="Sort order: asc, desc"),
+):
+    """Every product matching the list filters, streamed as NDJSON or CSV (gzip if the client accepts it)."""
+    if format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+    q = (search or "").strip() or None
+    if sort_by == "relevance" and q:
+        sort_order = "desc"
+    elif sort_by not in ("id", "name", "price"):
+        sort_by = "id"
+    query = crud.products_page_query(
+        limit=None,
+        category=(category or "").strip() or None,
+        min_price=_optional_decimal(min_price),
+        max_price=_optional_decimal(max_price),
         search=q,
         sort_by=sort_by,
-        sort_order=sort_order,
+        sort_order="desc" if sort_order.lower() == "desc" else "asc",
+        columns=EXPORT_COLUMNS,
     )
-    next_url = _paginated_url(request, offset + limit) if offset + limit < total else None
-    previous_url = _paginated_url(request, max(0, offset - limit)) if offset > 0 else None
-    return ProductsPaginatedResponse(
-        count=total,
-        next=next_url,
-        previous=previous_url,
-        results=[ProductListResponse.model_validate(p) for p in products],
+
+    # The body outlives the request's dependencies, so the stream opens (and closes) its own connection.
+    bind = replica_router.engine_for_reads()
+    catalog_reads.inc(target="primary" if bind is engine else "replica")
+
+    gzipped = accepts(request.headers.get("accept-encoding"), "gzip")
+    headers = {
+        "Content-Disposition": f'attachment; filename="products.{format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        stream_export(bind, query, format, gzipped), media_type=MEDIA_TYPES[format], headers=headers
     )
 
 
+@router.post("/bulk", response_model=ProductBulkResponse, dependencies=[Depends(bulk_limit)])
+async def bulk_products(
+    body: ProductBulkRequest,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Products for up to 100 ids in request order (duplicates dropped); unknown ids are listed in ``missing``."""
+    ids = list(dict.fromkeys(body.ids))
+    version = await response_cache.version()
+    keys = [response_cache.key("products:detail", version, {"id": product_id}) for product_id in ids]
+    bodies = dict(zip(ids, await response_cache.get_many("products:detail", keys)))
+    misses = [product_id for product_id, cached in bodies.items() if cached is None]
+    if misses:
+        found = await crud.get_products_by_ids(db, misses)
+        await release(db)
+        for product_id, key in zip(ids, keys):
+            if product_id in found:
+                bodies[product_id] = ProductDetailResponse.model_validate(found[product_id]).model_dump_json().encode()
+                await response_cache.set(key, bodies[product_id])
+    results = b",".join(cached for cached in bodies.values() if cached is not None)
+    missing = json.dumps([product_id for product_id, cached in bodies.items() if cached is None]).encode()
+    return Response(content=b'{"results":[' + results + b'],"missing":' + missing + b"}", media_type="application/json")
+
+
 @router.get("/{product_id}/", response_model=ProductDetailResponse)
 async def get_product(
     product_id: int,
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
 ):
-    product = await crud.get_product_by_id(db, product_id)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return ProductDetailResponse.model_validate(product)
+    key = await response_cache.entry_key("products:detail", {"id": product_id})
+
+    async def build() -> bytes:
+        product = await crud.get_product_by_id(db, product_id)
+        await release(db)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return ProductDetailResponse.model_validate(product).model_dump_json().encode()
+
+    return await _cached_response(request, "products:detail", key, build)
@@ -1,4 +1,5 @@
 from decimal import Decimal
+from typing import Literal
 from pydantic import BaseModel, Field, EmailStr
 
 
@@ -35,13 +36,50 @@ class ProductDetailResponse(ProductListResponse):
     description: str | None
 
 
+class ProductImport(BaseModel):
+    sku: str = Field(..., min_length=1, max_length=64)
+    name: str = Field(..., min_length=1, max_length=255)
+    description: str | None = None
+    price: Decimal = Field(..., ge=0, max_digits=12, decimal_places=2)
+    image: str | None = Field(None, max_length=500)
+    category: str = Field(..., min_length=1, max_length=100)
+
+
+class ProductBulkRequest(BaseModel):
+    ids: list[int] = Field(..., min_length=1, max_length=100)
+
+
+class ProductBulkResponse(BaseModel):
+    results: list[ProductDetailResponse]
+    missing: list[int]
+
+
 class ProductsPaginatedResponse(BaseModel):
-    count: int
+    count: int | None
     next: str | None
     previous: str | None
     results: list[ProductListResponse]
 
 
+class CategoryFacet(BaseModel):
+    category: str
+    count: int
+
+
+class PriceBucket(BaseModel):
+    min: Decimal
+    max: Decimal | None  # exclusive; None for the open-ended last bucket
+    count: int
+
+
+class ProductFacetsResponse(BaseModel):
+    count: int
+    min_price: Decimal | None
+    max_price: Decimal | None
+    categories: list[CategoryFacet]
+    price_buckets: list[PriceBucket]
+
+
 class CartItemAdd(BaseModel):
     product_id: int = Field(..., gt=0)
     quantity: int = Field(..., gt=0, le=999)
@@ -51,6 +89,16 @@ class CartItemUpdate(BaseModel):
     quantity: int = Field(..., gt=0, le=999)
 
 
+class CartOperation(BaseModel):
+    op: Literal["add", "set", "remove"]
+    product_id: int = Field(..., gt=0)
+    quantity: int = Field(1, gt=0, le=999)
+
+
+class CartBatch(BaseModel):
+    operations: list[CartOperation] = Field(..., min_length=1, max_length=200)
+
+
 class CartItemResponse(BaseModel):
     id: int
     product_id: int
@@ -67,4 +115,11 @@ class CartItemResponse(BaseModel):
 class CartResponse(BaseModel):
     id: int
     items: list[CartItemResponse]
+    item_count: int
+    total: Decimal
+
+
+class CartSummary(BaseModel):
+    id: int
+    item_count: int
     total: Decimal
@@ -0,0 +1,45 @@
+"""Product search.
+
+On PostgreSQL the ``ILIKE`` predicates are served by the pg_trgm GIN indexes declared on
+``Product`` and relevance uses ``similarity()`` from the same extension. Other backends
+(SQLite in tests) get a Python implementation of ``similarity()`` registered per connection,
+so the same SQL runs everywhere.
+"""
+import re
+from sqlalchemy import case, func, or_
+from sqlalchemy.sql.elements import ColumnElement
+from app.models import Product
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def trigrams(value: str) -> set[str]:
+    """Trigram set as pg_trgm builds it: lowercase words padded with two spaces in front, one behind."""
+    result: set[str] = set()
+    for word in _WORD_RE.findall(value.lower()):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(a: str | None, b: str | None) -> float:
+    if not a or not b:
+        return 0.0
+    ta, tb = trigrams(a), trigrams(b)
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+def register_sqlite_functions(dbapi_connection) -> None:
+    dbapi_connection.create_function("similarity", 2, similarity, deterministic=True)
+
+
+def search_condition(q: str) -> ColumnElement[bool]:
+    pattern = f"%{q}%"
+    return or_(Product.name.ilike(pattern), Product.description.ilike(pattern))
+
+
+def search_rank(q: str) -> ColumnElement[float]:
+    """Name matches first, then closeness of the name to the query."""
+    return case((Product.name.ilike(f"%{q}%"), 1.0), else_=0.0) + func.similarity(Product.name, q)
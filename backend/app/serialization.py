@@ -0,0 +1,26 @@
+"""Direct JSON encoding for hot endpoints that skip Pydantic response models.
+
+Output matches ``model_dump_json()``: compact separators, UTF-8 text and ``Decimal`` as a string.
+orjson is used when installed; the stdlib fallback produces the same bytes, only slower.
+"""
+import json
+from decimal import Decimal
+from typing import Any
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
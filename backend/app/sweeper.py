@@ -0,0 +1,95 @@
+"""Garbage collection of abandoned carts.
+
+Every session that adds to a cart gets a ``carts`` row, and bots and one-off visitors never come
+back. ``sweep_carts`` deletes carts whose last mutation (``updated_at``) is older than
+``cart_ttl_days``, or ``cart_empty_ttl_hours`` for carts without items. It walks the table in
+primary key order, ``cart_sweep_batch_size`` carts per short transaction with
+``cart_sweep_pause_seconds`` between them, so it never holds locks for long. In PostgreSQL carts
+locked by a request in flight are skipped (``SKIP LOCKED``) rather than waited on.
+
+``updated_at`` is deliberately not indexed: every cart mutation rewrites it, and an index would
+turn those updates into non-HOT ones; one primary key pass per sweep is cheaper.
+
+Runs in the API process (``run_cart_sweeper``, started by the lifespan) or once from
+``scripts/sweep_carts.py``.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, delete, exc, or_, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.config import settings
+from app.database import engine
+from app.metrics import Counter, Histogram
+from app.models import Cart, CartItem
+
+log = logging.getLogger("app.sweeper")
+
+carts_swept = Counter("carts_swept_total", "Expired carts deleted by the sweeper.")
+sweep_duration = Histogram(
+    "cart_sweep_duration_seconds",
+    "Wall time of one sweep, including pauses between batches.",
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0),
+)
+
+
+def expired(now: datetime):
+    carts = Cart.__table__
+    cutoff = now - timedelta(days=settings.cart_ttl_days)
+    empty_cutoff = now - timedelta(hours=settings.cart_empty_ttl_hours)
+    return or_(carts.c.updated_at < cutoff, and_(carts.c.item_count == 0, carts.c.updated_at < empty_cutoff))
+
+
+async def sweep_carts(
+    db_engine: AsyncEngine = engine,
+    *,
+    batch_size: int | None = None,
+    pause: float | None = None,
+    now: datetime | None = None,
+) -> int:
+    """Delete expired carts with their lines, batch by batch; returns the number of carts reclaimed."""
+    batch_size = batch_size or settings.cart_sweep_batch_size
+    pause = settings.cart_sweep_pause_seconds if pause is None else pause
+    condition = expired(now or datetime.now(timezone.utc))
+    carts, items = Cart.__table__, CartItem.__table__
+    started = asyncio.get_running_loop().time()
+    reclaimed = 0
+    after = 0
+    try:
+        while True:
+            query = (
+                select(carts.c.id)
+                .where(carts.c.id > after, condition)
+                .order_by(carts.c.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            async with db_engine.begin() as conn:
+                ids = list((await conn.execute(query)).scalars())
+                if not ids:
+                    break
+                # Re-check on delete: without row locks (SQLite) a cart may have been touched since.
+                stmt = delete(carts).where(carts.c.id.in_(ids), condition).returning(carts.c.id)
+                deleted = list((await conn.execute(stmt)).scalars())
+                if deleted:
+                    await conn.execute(delete(items).where(items.c.cart_id.in_(deleted)))
+            reclaimed += len(deleted)
+            carts_swept.inc(len(deleted))
+            if len(ids) < batch_size:
+                break
+            after = ids[-1]
+            await asyncio.sleep(pause)
+    finally:
+        sweep_duration.observe(asyncio.get_running_loop().time() - started)
+    return reclaimed
+
+
+async def run_cart_sweeper() -> None:
+    while True:
+        try:
+            reclaimed = await sweep_carts()
+        except (OSError, exc.SQLAlchemyError):
+            log.exception("cart sweep failed")
+        else:
+            log.info("cart sweep reclaimed %d carts", reclaimed)
+        await asyncio.sleep(settings.cart_sweep_interval_seconds)
@@ -0,0 +1,143 @@
+"""Per-request instrumentation: route metrics, the ``Server-Timing`` header and the slow-query log.
+
+``RequestMetricsMiddleware`` starts a ``RequestTimings`` for each HTTP request. SQLAlchemy hooks in
+``app.database`` add every SQL statement (count and duration), the pool checkout wait and the time
+connections were held. When the request finishes the totals are recorded per route template.
+"""
+import logging
+import time
+from contextvars import ContextVar
+from app.config import settings
+from app.metrics import Histogram
+
+slow_query_log = logging.getLogger("app.slow_queries")
+
+ROUTE_LABELS = ("method", "route")
+request_duration = Histogram(
+    "http_request_duration_seconds", "Request latency by route template.", ROUTE_LABELS + ("status",)
+)
+request_statements = Histogram(
+    "http_request_db_statements",
+    "SQL statements executed per request.",
+    ROUTE_LABELS,
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+request_db_time = Histogram("http_request_db_seconds", "Time spent executing SQL per request.", ROUTE_LABELS)
+request_pool_wait = Histogram(
+    "http_request_db_pool_wait_seconds", "Time spent waiting for pooled connections per request.", ROUTE_LABELS
+)
+connection_hold = Histogram(
+    "http_request_db_connection_hold_seconds",
+    "Total time database connections were checked out while serving a request.",
+    ROUTE_LABELS,
+)
+response_size = Histogram(
+    "http_response_size_bytes",
+    "Response body size as sent (after compression).",
+    ROUTE_LABELS,
+    buckets=(100, 1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 10_000_000),
+)
+
+
+class RequestTimings:
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.started = time.perf_counter()
+        self.db_hold = 0.0
+        self.db_connections = 0
+        self.db_statements = 0
+        self.db_time = 0.0
+        self.pool_wait = 0.0
+        self._open: dict[int, float] = {}
+
+    def connection_checked_out(self, token: int) -> None:
+        self.db_connections += 1
+        self._open[token] = time.perf_counter()
+
+    def connection_checked_in(self, token: int) -> None:
+        started = self._open.pop(token, None)
+        if started is not None:
+            self.db_hold += time.perf_counter() - started
+
+    def statement_finished(self, duration: float) -> None:
+        self.db_statements += 1
+        self.db_time += duration
+
+    def held(self) -> float:
+        """Hold time so far, counting connections that are still checked out."""
+        now = time.perf_counter()
+        return self.db_hold + sum(now - started for started in self._open.values())
+
+    def header(self) -> str:
+        total = (time.perf_counter() - self.started) * 1000
+        return ", ".join(
+            (
+                f'db;dur={self.db_time * 1000:.2f};desc="{self.db_statements} queries"',
+                f'db-hold;dur={self.held() * 1000:.2f};desc="{self.db_connections} conn"',
+                f"pool-wait;dur={self.pool_wait * 1000:.2f}",
+                f"app;dur={total:.2f}",
+            )
+        )
+
+
+_current: ContextVar[RequestTimings | None] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> RequestTimings | None:
+    return _current.get()
+
+
+def statement_finished(statement: str, duration: float) -> None:
+    """Called by the SQLAlchemy hooks after every statement."""
+    timings = _current.get()
+    if timings is not None:
+        timings.statement_finished(duration)
+    if settings.slow_query_ms and duration * 1000 >= settings.slow_query_ms:
+        slow_query_log.warning(
+            "slow query %.1f ms%s: %s",
+            duration * 1000,
+            f" [{timings.label}]" if timings is not None else "",
+            " ".join(statement.split())[:1000],
+        )
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware recording per-route metrics and adding ``Server-Timing``."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings(f"{scope['method']} {scope['path']}")
+        token = _current.set(timings)
+        status = 500
+        size = 0
+
+        async def send_with_timing(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", timings.header().encode()))
+                    message = dict(message, headers=headers)
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            # Route templates keep label cardinality bounded; unknown paths share one label.
+            route = scope.get("route")
+            labels = {"method": scope["method"], "route": getattr(route, "path", "unmatched")}
+            request_duration.observe(time.perf_counter() - timings.started, status=str(status), **labels)
+            request_statements.observe(timings.db_statements, **labels)
+            request_db_time.observe(timings.db_time, **labels)
+            request_pool_wait.observe(timings.pool_wait, **labels)
+            connection_hold.observe(timings.held(), **labels)
+            response_size.observe(size, **labels)
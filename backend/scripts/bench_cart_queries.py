@@ -0,0 +1,83 @@
+"""Бенчмарк корзины: число SQL-запросов и время на вызов каждого эндпоинта.
+Запуск: python scripts/bench_cart_queries.py [iterations]
+По умолчанию БД из DATABASE_URL (например sqlite+aiosqlite:///bench.db для локального прогона).
+"""
+import asyncio
+import inspect
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi import Response
+from sqlalchemy import event
+
+from app.database import AsyncSessionLocal, engine
+from app.migrations import init_schema
+from app.models import Product
+from app.routers import cart
+from app.schemas import CartItemAdd, CartItemUpdate
+
+statements = 0
+
+
+def _count(conn, cursor, statement, parameters, context, executemany):
+    global statements
+    statements += 1
+
+
+async def call(endpoint, *args, **kwargs) -> tuple[int, float, object]:
+    global statements
+    async with AsyncSessionLocal() as db:
+        statements = 0
+        started = time.perf_counter()
+        # Server-side cart storage: no cart token, and a throwaway Response for token headers.
+        params = inspect.signature(endpoint).parameters
+        extra = {name: value for name, value in (("response", Response()), ("token_lines", None)) if name in params}
+        result = await endpoint(*args, db=db, **extra, **kwargs)
+        await db.commit()
+        return statements, time.perf_counter() - started, result
+
+
+async def bench(iterations: int) -> None:
+    async with engine.begin() as conn:
+        await init_schema(conn)
+    async with AsyncSessionLocal() as db:
+        product = Product(name="Bench product", price=100, category="Bench")
+        db.add(product)
+        await db.commit()
+        product_id = product.id
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _count)
+    rows: dict[str, list[tuple[int, float]]] = {}
+    for _ in range(iterations):
+        session_id = f"bench-{uuid.uuid4()}"
+        for name, endpoint, args in [
+            ("POST /api/cart/ (new cart)", cart.add_to_cart, (CartItemAdd(product_id=product_id, quantity=1),)),
+            ("POST /api/cart/ (increment)", cart.add_to_cart, (CartItemAdd(product_id=product_id, quantity=2),)),
+            ("GET /api/cart/summary", cart.get_cart_summary, ()),
+            ("GET /api/cart/", cart.get_cart, ()),
+        ]:
+            count, elapsed, result = await call(endpoint, *args, session_id=session_id)
+            rows.setdefault(name, []).append((count, elapsed))
+        item_id = result.items[0].id
+        for name, endpoint, args in [
+            ("PUT /api/cart/{id}/", cart.update_cart_item, (item_id, CartItemUpdate(quantity=5))),
+            ("DELETE /api/cart/{id}/", cart.delete_cart_item, (item_id,)),
+        ]:
+            count, elapsed, _ = await call(endpoint, *args, session_id=session_id)
+            rows.setdefault(name, []).append((count, elapsed))
+    event.remove(engine.sync_engine, "before_cursor_execute", _count)
+
+    print(f"{'endpoint':32} {'queries':>8} {'avg ms':>8}")
+    for name, samples in rows.items():
+        queries = max(count for count, _ in samples)
+        avg_ms = sum(elapsed for _, elapsed in samples) / len(samples) * 1000
+        print(f"{name:32} {queries:>8} {avg_ms:>8.2f}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(bench(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
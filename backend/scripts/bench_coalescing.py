@@ -0,0 +1,93 @@
+"""Нагрузочный тест объединения одинаковых запросов каталога (REQUEST_COALESCING).
+Запуск: python scripts/bench_coalescing.py [--burst 200] [--pages 5]
+Поднимает приложение на временной SQLite-базе (или на DATABASE_URL, если задан) с выключенным кэшем ответов,
+отправляет пачки одновременных запросов (один и тот же список, одна и та же карточка, --pages разных страниц)
+и сравнивает число SQL-запросов и задержку с объединением и без него.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_tmp.name}/coalescing.db")
+os.environ["CACHE_BACKEND"] = "none"
+os.environ["RATE_LIMIT_BACKEND"] = "none"
+os.environ["CART_SWEEP_INTERVAL_SECONDS"] = "0"
+os.environ["SLOW_QUERY_MS"] = "0"
+
+import httpx
+from sqlalchemy import event
+
+from app.cache import coalesced_requests
+from app.config import settings
+from app.database import AsyncSessionLocal, engine
+from app.main import app
+from app.models import Product
+
+statements = 0
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count(conn, cursor, statement, parameters, context, executemany):
+    global statements
+    statements += 1
+
+
+def coalesced() -> float:
+    return sum(coalesced_requests.values.values())
+
+
+async def burst(client: httpx.AsyncClient, urls: list[str]) -> tuple[int, float, float, float]:
+    """Fire all urls at once; returns (statements, coalesced requests, p50 ms, max ms)."""
+    global statements
+    statements = 0
+    before = coalesced()
+
+    async def one(url: str) -> float:
+        started = time.perf_counter()
+        response = await client.get(url)
+        response.raise_for_status()
+        return (time.perf_counter() - started) * 1000
+
+    latencies = sorted(await asyncio.gather(*(one(url) for url in urls)))
+    return statements, coalesced() - before, latencies[len(latencies) // 2], latencies[-1]
+
+
+async def main(size: int, pages: int) -> None:
+    async with app.router.lifespan_context(app):
+        async with AsyncSessionLocal() as db:
+            products = [Product(name=f"Стол {i}", price=10 * i, category=f"Кат {i % 7}") for i in range(1, 2001)]
+            db.add_all(products)
+            await db.commit()
+            product_id = products[0].id
+
+        scenarios = {
+            "list, same page": ["/api/products/?limit=50&sort_by=price"] * size,
+            "search, same query": ["/api/products/?search=стол 1&limit=20"] * size,
+            "detail, same id": [f"/api/products/{product_id}/"] * size,
+            f"list, {pages} pages": [f"/api/products/?limit=50&offset={50 * (i % pages)}" for i in range(size)],
+        }
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            print(f"burst of {size} concurrent requests, response cache disabled\n")
+            print(f"{'scenario':22} {'coalescing':>10} {'queries':>8} {'coalesced':>9} {'p50 ms':>8} {'max ms':>8}")
+            for name, urls in scenarios.items():
+                for enabled in (False, True):
+                    settings.request_coalescing = enabled
+                    await burst(client, urls[:5])  # warm up connections
+                    count, shared, p50, worst = await burst(client, urls)
+                    print(f"{name:22} {'on' if enabled else 'off':>10} {count:8d} {shared:9.0f} {p50:8.1f} {worst:8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--burst", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.burst, args.pages))
@@ -0,0 +1,57 @@
+"""Бенчмарк сжатия ответов: байты «на проводе» и CPU на запрос для gzip / br / zstd на нескольких уровнях.
+Запуск: python scripts/bench_compression.py [--limit 100] [--iterations 200]
+БД не нужна: страница списка собирается из синтетического каталога (scripts/generate_products.py)
+тем же кодом, что и в API. br и zstd измеряются, если установлены пакеты brotli / zstandard.
+Сжатый ответ из кэша стоит только чтения из кэша — CPU на сжатие тратится один раз на версию каталога.
+"""
+import argparse
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.compression import ENCODERS
+from app.routers.products import _page_body
+from generate_products import generate
+
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 8, 11), "zstd": (1, 3, 9, 19)}
+
+
+def sample_page(limit: int) -> bytes:
+    rows = [
+        (i, r["name"], Decimal(r["price"]), r["image"], r["category"])
+        for i, r in enumerate(generate(limit, seed=7), start=1)
+    ]
+    next_url = f"https://api.example.com/api/products/?limit={limit}&offset={limit}&sort_by=price"
+    return _page_body(100_000, next_url, None, rows)
+
+
+def cpu_per_call(fn, iterations: int) -> float:
+    started = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - started) / iterations
+
+
+def main(limit: int, iterations: int) -> None:
+    body = sample_page(limit)
+    print(f"Product page limit={limit}: {len(body)} bytes uncompressed, {iterations} iterations per row\n")
+    print(f"{'encoding':10} {'level':>5} {'bytes':>8} {'ratio':>7} {'CPU ms/req':>11}")
+    for encoding, encoder in ENCODERS.items():
+        for level in LEVELS[encoding]:
+            size = len(encoder(body, level))
+            cpu = cpu_per_call(lambda: encoder(body, level), iterations)
+            print(f"{encoding:10} {level:5d} {size:8d} {len(body) / size:6.1f}x {cpu * 1000:11.3f}")
+    missing = sorted(set(LEVELS) - set(ENCODERS))
+    if missing:
+        print(f"\nNot installed: {', '.join(missing)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare response compression settings.")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    main(args.limit, args.iterations)
@@ -0,0 +1,80 @@
+"""Микро-бенчмарк страницы списка товаров: ORM + Pydantic против строк колонок + прямой JSON (быстрый путь).
+Запуск: python scripts/bench_list_serialization.py [--limit 100] [--iterations 500]
+БД из DATABASE_URL; в ней должно быть не меньше --limit товаров (seed или импорт).
+Проверяет, что оба пути дают одинаковые байты, и печатает время запроса+сериализации и одной сериализации.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import crud
+from app.database import AsyncSessionLocal, engine
+from app.routers.products import _page_body
+from app.schemas import ProductListResponse, ProductsPaginatedResponse
+
+
+def pydantic_body(total, products) -> bytes:
+    return (
+        ProductsPaginatedResponse(
+            count=total,
+            next=None,
+            previous=None,
+            results=[ProductListResponse.model_validate(p) for p in products],
+        )
+        .model_dump_json()
+        .encode()
+    )
+
+
+async def orm_path(limit: int) -> tuple[bytes, float]:
+    async with AsyncSessionLocal() as db:
+        products, total = await crud.get_products(db, limit=limit, sort_by="price")
+    started = time.perf_counter()
+    body = pydantic_body(total, products)
+    return body, time.perf_counter() - started
+
+
+async def fast_path(limit: int) -> tuple[bytes, float]:
+    async with AsyncSessionLocal() as db:
+        rows, total = await crud.get_products(db, limit=limit, sort_by="price", columns=crud.PRODUCT_LIST_COLUMNS)
+    started = time.perf_counter()
+    body = _page_body(total, None, None, rows)
+    return body, time.perf_counter() - started
+
+
+async def measure(path, limit: int, iterations: int) -> tuple[list[float], list[float]]:
+    totals, serialization = [], []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        _, encode = await path(limit)
+        totals.append(time.perf_counter() - started)
+        serialization.append(encode)
+    return totals, serialization
+
+
+async def main(limit: int, iterations: int) -> None:
+    orm_body, _ = await orm_path(limit)
+    fast_body, _ = await fast_path(limit)
+    if orm_body != fast_body:
+        sys.exit("Fast path output differs from the Pydantic response model.")
+    print(f"limit={limit}, {iterations} iterations, identical {len(fast_body)}-byte bodies\n")
+    print(f"{'path':18} {'total p50 ms':>13} {'encode p50 ms':>14} {'encode share':>13}")
+    for name, path in (("ORM + Pydantic", orm_path), ("columns + dumps", fast_path)):
+        await measure(path, limit, max(iterations // 10, 1))  # warm-up
+        totals, serialization = await measure(path, limit, iterations)
+        total, encode = statistics.median(totals), statistics.median(serialization)
+        print(f"{name:18} {total * 1000:13.3f} {encode * 1000:14.3f} {encode / total:12.0%}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare list serialization paths.")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.limit, args.iterations))
@@ -0,0 +1,80 @@
+"""Бенчмарк: задержка запросов каталога во время волны логинов (bcrypt в event loop против пула потоков).
+Запуск: python scripts/bench_login_latency.py [logins] [concurrency]
+БД из DATABASE_URL (например sqlite+aiosqlite:///bench.db); в ней должны быть товары (seed или импорт).
+"""
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import crud
+from app.auth import PasswordHasherBusy, hash_password, password_hasher, verify_password
+from app.database import AsyncSessionLocal, engine
+from app.migrations import init_schema
+
+
+async def probe_catalog(stop: asyncio.Event, samples: list[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            await crud.get_products(db, limit=20)
+        samples.append(time.perf_counter() - started)
+        await asyncio.sleep(0.005)
+
+
+async def run_logins(mode: str, hashed: str, logins: int, concurrency: int) -> int:
+    rejected = 0
+    queue = iter(range(logins))
+
+    async def worker() -> None:
+        nonlocal rejected
+        for _ in queue:
+            if mode == "blocking":
+                verify_password("secret123", hashed)
+                await asyncio.sleep(0)
+            else:
+                try:
+                    await password_hasher.verify("secret123", hashed)
+                except PasswordHasherBusy:
+                    rejected += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return rejected
+
+
+async def scenario(mode: str, hashed: str, logins: int, concurrency: int) -> None:
+    samples: list[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_catalog(stop, samples))
+    started = time.perf_counter()
+    if mode == "idle":
+        await asyncio.sleep(1)
+        rejected = 0
+    else:
+        rejected = await run_logins(mode, hashed, logins, concurrency)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    ms = sorted(s * 1000 for s in samples)
+    p99 = ms[min(len(ms) - 1, int(len(ms) * 0.99))]
+    print(
+        f"{mode:9} catalog p50 {statistics.median(ms):7.2f} ms  p99 {p99:7.2f} ms  max {ms[-1]:7.2f} ms  "
+        f"({len(ms)} requests, logins took {elapsed:.2f}s, 503s: {rejected})"
+    )
+
+
+async def main(logins: int, concurrency: int) -> None:
+    async with engine.begin() as conn:
+        await init_schema(conn)
+    hashed = hash_password("secret123")
+    for mode in ("idle", "blocking", "pool"):
+        await scenario(mode, hashed, logins, concurrency)
+    password_hasher.shutdown()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 40, int(sys.argv[2]) if len(sys.argv) > 2 else 8))
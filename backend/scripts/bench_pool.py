@@ -0,0 +1,112 @@
+"""Нагрузочный тест пула соединений: пропускная способность, задержка и ожидание соединения
+для набора конфигураций пула (DB_POOL_*, DB_STATEMENT_CACHE_SIZE, DB_PGBOUNCER).
+Запуск: python scripts/bench_pool.py [--concurrency 50] [--duration 5] [--hold-ms 5]
+БД из DATABASE_URL; в ней должны быть товары (seed или импорт). Режим pgbouncer имеет смысл только
+для PostgreSQL (asyncpg). SQLite работает без настраиваемого пула, поэтому на ней скрипт сразу завершается.
+
+Каждый «запрос» берёт соединение из пула, выполняет страницу списка товаров и держит соединение
+ещё --hold-ms (имитация сериализации ответа), как это делает обработчик API.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import QueuePool
+
+from app import crud
+from app.config import settings
+from app.database import engine_options
+
+DATABASE_URL = os.environ.get("DATABASE_URL", settings.database_url)
+
+SCENARIOS = {
+    "default (5+10)": {},
+    "small, no overflow (2+0)": {"db_pool_size": 2, "db_max_overflow": 0},
+    "tight timeout (2+0, 0.05s)": {"db_pool_size": 2, "db_max_overflow": 0, "db_pool_timeout": 0.05},
+    "large (20+10)": {"db_pool_size": 20, "db_max_overflow": 10},
+    "pre-ping": {"db_pool_pre_ping": True},
+    "recycle every 1s": {"db_pool_recycle": 1},
+    "no statement cache": {"db_statement_cache_size": 0},
+    "pgbouncer mode": {"db_pgbouncer": True},
+}
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def scenario(overrides: dict, concurrency: int, duration: float, hold: float) -> dict:
+    config = settings.model_copy(update=overrides)
+    engine = create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL, config))
+    query = crud.products_page_query(limit=21, sort_by="price", sort_order="asc")
+    latencies: list[float] = []
+    waits: list[float] = []
+    timeouts = 0
+    peak = 0
+    deadline = time.perf_counter() + duration
+
+    async def client() -> None:
+        nonlocal timeouts, peak
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                async with engine.connect() as conn:
+                    waits.append(time.perf_counter() - started)
+                    if isinstance(engine.pool, QueuePool):
+                        peak = max(peak, engine.pool.checkedout())
+                    await conn.execute(query)
+                    await asyncio.sleep(hold)
+            except exc.TimeoutError:
+                timeouts += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p99": percentile(latencies, 0.99),
+        "wait_p99": percentile(waits, 0.99),
+        "timeouts": timeouts,
+        "peak": peak,
+    }
+
+
+async def main(concurrency: int, duration: float, hold: float, only: list[str] | None) -> None:
+    if make_url(DATABASE_URL).get_backend_name() == "sqlite":
+        sys.exit("SQLite uses SQLAlchemy's default pool and ignores DB_POOL_*; run against PostgreSQL.")
+    print(f"{concurrency} concurrent clients, {duration:.0f}s per scenario, connection held {hold * 1000:.0f}ms\n")
+    print(f"{'scenario':28} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'wait p99':>9} {'timeouts':>9} {'peak conns':>11}")
+    for name, overrides in SCENARIOS.items():
+        if only and not any(part in name for part in only):
+            continue
+        r = await scenario(overrides, concurrency, duration, hold)
+        print(
+            f"{name:28} {r['rps']:8.0f} {r['p50'] * 1000:8.1f} {r['p99'] * 1000:8.1f} "
+            f"{r['wait_p99'] * 1000:9.1f} {r['timeouts']:9d} {r['peak']:11d}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare connection pool settings under load.")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--hold-ms", type=float, default=5)
+    parser.add_argument("--only", nargs="*", help="run scenarios whose name contains any of these")
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.duration, args.hold_ms / 1000, args.only))
@@ -0,0 +1,93 @@
+"""Бенчмарк накладных расходов rate limiting: микросекунды на запрос и память на ключ.
+Запуск: python scripts/bench_rate_limit.py [--requests 200000] [--keys 100000]
+БД и сеть не нужны: LocalBuckets.take, зависимость RateLimit и RateLimitMiddleware вызываются напрямую
+(middleware — вокруг пустого ASGI-приложения, в сравнении с тем же приложением без него).
+"""
+import argparse
+import asyncio
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from starlette.requests import HTTPConnection
+
+from app import ratelimit
+from app.ratelimit import LocalBuckets, RateLimit, RateLimitMiddleware
+
+
+def scope(i: int, keys: int) -> dict:
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": "/api/products/",
+        "query_string": b"search=abc",
+        "headers": [(b"x-session-id", f"sess-{i % keys}".encode())],
+        "client": (f"10.{i % keys // 65536}.{i % keys // 256 % 256}.{i % 256}", 50000),
+    }
+
+
+async def empty_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def send(message):
+    pass
+
+
+async def receive():
+    return {"type": "http.request"}
+
+
+async def per_call(fn, n: int) -> float:
+    started = time.perf_counter()
+    for i in range(n):
+        await fn(i)
+    return (time.perf_counter() - started) / n * 1e6
+
+
+async def main(requests: int, keys: int) -> None:
+    # Generous limits: measure the bookkeeping, not rejections.
+    buckets = LocalBuckets(max_keys=keys)
+    ratelimit.store = buckets
+    scopes = [scope(i, keys) for i in range(min(requests, keys))]
+    key_names = [f"catalog:{s['client'][0]}" for s in scopes]
+
+    print(f"{requests} calls, {keys} distinct clients\n")
+    rows = []
+    rows.append(("LocalBuckets.take", await per_call(
+        lambda i: buckets.take(key_names[i % len(key_names)], 1e9, 10**9), requests
+    )))
+    search_cost = lambda conn: 5.0 if conn.query_params.get("search") else 1.0  # noqa: E731
+    limit = RateLimit("catalog", rate=1e9, burst=10**9, cost=search_cost)
+    rows.append(("RateLimit dependency (with cost)", await per_call(
+        lambda i: limit(HTTPConnection(scopes[i % len(scopes)])), requests
+    )))
+    ratelimit.settings.rate_limit_rps, ratelimit.settings.rate_limit_burst = 1e9, 10**9
+    # Middleware keys are new to the (full) store, so this also measures eviction on every call.
+    bare = await per_call(lambda i: empty_app(scopes[i % len(scopes)], receive, send), requests)
+    wrapped_app = RateLimitMiddleware(empty_app)
+    wrapped = await per_call(lambda i: wrapped_app(scopes[i % len(scopes)], receive, send), requests)
+    rows.append(("RateLimitMiddleware (added per request)", wrapped - bare))
+    for name, micros in rows:
+        print(f"{name:42} {micros:8.2f} µs")
+
+    fresh = LocalBuckets(max_keys=keys)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for name in key_names:
+        await fresh.take(name, 1.0, 10)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"\nLocalBuckets memory: {used / len(fresh):.0f} bytes per key ({len(fresh)} keys, key strings included)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure rate limiting overhead.")
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--keys", type=int, default=100_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.keys))
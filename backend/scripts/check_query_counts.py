@@ -0,0 +1,119 @@
+"""Проверка числа SQL-запросов на эндпоинт (ловит N+1 в CI).
+Запуск: python scripts/check_query_counts.py
+Поднимает приложение на временной SQLite-базе (или на DATABASE_URL, если задан), с выключенным кэшем
+ответов проходит основные сценарии каталога, корзины и авторизации и сверяет число запросов из заголовка
+Server-Timing с бюджетом BUDGETS. Завершается с кодом 1, если какой-то эндпоинт превысил бюджет.
+"""
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_tmp.name}/queries.db")
+os.environ["CACHE_BACKEND"] = "none"
+os.environ["RATE_LIMIT_BACKEND"] = "none"
+os.environ["SERVER_TIMING"] = "true"
+os.environ["BCRYPT_ROUNDS"] = "4"
+
+from fastapi.testclient import TestClient
+
+from app.database import AsyncSessionLocal
+from app.main import app
+from app.models import Product
+
+# Statements per request, cache disabled.
+BUDGETS = {
+    "GET /api/products/": 2,
+    "GET /api/products/?search": 1,
+    "GET /api/products/?pagination=cursor": 2,
+    "GET /api/products/facets": 1,
+    "GET /api/products/facets?search": 1,
+    "POST /api/products/bulk": 1,
+    "GET /api/products/{id}/": 1,
+    "POST /api/cart/ (new cart)": 4,
+    "POST /api/cart/ (increment)": 4,
+    "POST /api/cart/batch": 5,
+    "GET /api/cart/": 1,
+    "GET /api/cart/summary": 1,
+    "PUT /api/cart/{id}/": 3,
+    "DELETE /api/cart/{id}/": 3,
+    "POST /api/auth/login": 1,
+    "GET /api/auth/me (new token)": 2,
+    "GET /api/auth/me (verified token)": 1,
+}
+
+QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+def statements(response) -> int:
+    match = QUERIES.search(response.headers.get("server-timing", ""))
+    if match is None:
+        sys.exit(f"No Server-Timing db entry on {response.request.method} {response.request.url}")
+    return int(match.group(1))
+
+
+def main() -> int:
+    results: dict[str, int] = {}
+    with TestClient(app) as client:
+
+        async def seed() -> list[int]:
+            async with AsyncSessionLocal() as db:
+                products = [Product(name=f"Стол {i}", price=100 * i, category="Мебель") for i in range(1, 31)]
+                db.add_all(products)
+                await db.commit()
+                return [p.id for p in products]
+
+        ids = client.portal.call(seed)
+        cart_headers = {"X-Session-ID": "query-budget"}
+
+        def run(name: str, method: str, url: str, **kwargs):
+            response = client.request(method, url, **kwargs)
+            if response.status_code >= 400:
+                sys.exit(f"{name}: HTTP {response.status_code} {response.text}")
+            results[name] = statements(response)
+            return response
+
+        run("GET /api/products/", "GET", "/api/products/?limit=20")
+        run("GET /api/products/?search", "GET", "/api/products/?search=стол&limit=20")
+        run("GET /api/products/?pagination=cursor", "GET", "/api/products/?pagination=cursor&sort_by=price")
+        run("GET /api/products/facets", "GET", "/api/products/facets?category=Мебель")
+        run("GET /api/products/facets?search", "GET", "/api/products/facets?search=стол&min_price=500")
+        run("POST /api/products/bulk", "POST", "/api/products/bulk", json={"ids": ids[:10]})
+        run("GET /api/products/{id}/", "GET", f"/api/products/{ids[0]}/")
+        item = {"product_id": ids[0], "quantity": 1}
+        run("POST /api/cart/ (new cart)", "POST", "/api/cart/", json=item, headers=cart_headers)
+        cart = run("POST /api/cart/ (increment)", "POST", "/api/cart/", json=item, headers=cart_headers).json()
+        operations = [{"op": "add", "product_id": product_id} for product_id in ids[1:6]]
+        run("POST /api/cart/batch", "POST", "/api/cart/batch", json={"operations": operations}, headers=cart_headers)
+        run("GET /api/cart/", "GET", "/api/cart/", headers=cart_headers)
+        run("GET /api/cart/summary", "GET", "/api/cart/summary", headers=cart_headers)
+        item_id = cart["items"][0]["id"]
+        run("PUT /api/cart/{id}/", "PUT", f"/api/cart/{item_id}/", json={"quantity": 5}, headers=cart_headers)
+        run("DELETE /api/cart/{id}/", "DELETE", f"/api/cart/{item_id}/", headers=cart_headers)
+        credentials = {"email": "budget@example.com", "password": "secret123"}
+        client.post("/api/auth/register", json=credentials)
+        token = run(
+            "POST /api/auth/login",
+            "POST",
+            "/api/auth/login",
+            data={"username": credentials["email"], "password": credentials["password"]},
+        ).json()["access_token"]
+        auth = {"Authorization": f"Bearer {token}"}
+        run("GET /api/auth/me (new token)", "GET", "/api/auth/me", headers=auth)
+        run("GET /api/auth/me (verified token)", "GET", "/api/auth/me", headers=auth)
+
+    failures = 0
+    print(f"{'endpoint':40} {'queries':>8} {'budget':>7}")
+    for name, count in results.items():
+        over = count > BUDGETS[name]
+        failures += over
+        print(f"{name:40} {count:8d} {BUDGETS[name]:7d}{'  OVER BUDGET' if over else ''}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,7 +12,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
-from app.database import Base
+from app.migrations import init_schema
 from app.models import User
 from app.auth import hash_password
 
@@ -25,7 +25,7 @@ DATABASE_URL = os.environ.get(
 async def create_user(email: str, password: str) -> None:
     engine = create_async_engine(DATABASE_URL)
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await init_schema(conn)
 
     async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
     async with async_session() as session:
@@ -0,0 +1,59 @@
+"""Генератор синтетического каталога для нагрузочных тестов импорта и списка товаров.
+Запуск: python scripts/generate_products.py 100000 > products.csv
+        python scripts/generate_products.py 100000 --format jsonl -o products.jsonl
+Строки пишутся потоково; одинаковый --seed даёт одинаковый каталог.
+"""
+import argparse
+import csv
+import json
+import random
+import sys
+from typing import Iterator, TextIO
+
+CATEGORIES = ["Электроника", "Мебель", "Освещение", "Ремонт", "Сантехника", "Инструменты", "Текстиль", "Сад"]
+ADJECTIVES = ["Компактный", "Классический", "Профессиональный", "Складной", "Беспроводной", "Угловой", "Матовый"]
+NOUNS = ["светильник", "стол", "шкаф", "смеситель", "перфоратор", "плед", "диван", "кабель", "ламинат", "кресло"]
+COLUMNS = ["sku", "name", "description", "price", "image", "category"]
+
+
+def generate(count: int, seed: int) -> Iterator[dict]:
+    rng = random.Random(seed)
+    for i in range(1, count + 1):
+        noun = rng.choice(NOUNS)
+        yield {
+            "sku": f"SKU-{i:09d}",
+            "name": f"{rng.choice(ADJECTIVES)} {noun} {rng.randint(100, 9999)}",
+            "description": f"Синтетический товар #{i}: {noun}, партия {rng.randint(1, 500)}.",
+            "price": f"{rng.lognormvariate(8.5, 1.0):.2f}",
+            "image": f"https://picsum.photos/seed/{i}/400",
+            "category": rng.choice(CATEGORIES),
+        }
+
+
+def write(rows: Iterator[dict], fmt: str, out: TextIO) -> None:
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        for row in rows:
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic product catalog.")
+    parser.add_argument("count", type=int)
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("-o", "--output", help="file path (stdout by default)")
+    args = parser.parse_args()
+    rows = generate(args.count, args.seed)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as out:
+            write(rows, args.format, out)
+    else:
+        write(rows, args.format, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
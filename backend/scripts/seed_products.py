@@ -1,7 +1,7 @@
 """Скрипт для заполнения БД тестовыми товарами. Запуск: python scripts/seed_products.py"""
 import os
 from app.models import Product
-from app.database import Base
+from app.migrations import init_schema
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy import text
@@ -21,7 +21,7 @@ DATABASE_URL = os.environ.get(
 async def seed():
     engine = create_async_engine(DATABASE_URL)
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await init_schema(conn)
 
     async_session = sessionmaker(
         engine, class_=AsyncSession, expire_on_commit=False)
@@ -0,0 +1,32 @@
+"""Удаление просроченных корзин — то же, что делает фоновая задача API (app/sweeper.py), один проход.
+Запуск: python scripts/sweep_carts.py [--batch-size 500] [--pause 0.5]
+Сроки берутся из CART_TTL_DAYS и CART_EMPTY_TTL_HOURS (окружение или .env), БД — из DATABASE_URL.
+Удобно для cron, если фоновая задача выключена (CART_SWEEP_INTERVAL_SECONDS=0).
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database import engine
+from app.sweeper import sweep_carts
+
+
+async def main(batch_size: int | None, pause: float | None) -> None:
+    started = time.perf_counter()
+    try:
+        reclaimed = await sweep_carts(batch_size=batch_size, pause=pause)
+    finally:
+        await engine.dispose()
+    print(f"Reclaimed {reclaimed} carts in {time.perf_counter() - started:.1f}s.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete expired carts in small batches.")
+    parser.add_argument("--batch-size", type=int, default=None, help="carts per transaction (CART_SWEEP_BATCH_SIZE)")
+    parser.add_argument("--pause", type=float, default=None, help="seconds between batches (CART_SWEEP_PAUSE_SECONDS)")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.pause))
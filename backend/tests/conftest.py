@@ -0,0 +1,23 @@
+"""Test setup: the app runs against two SQLite files standing in for the primary and a read replica.
+
+Settings are read when ``app`` is imported, so the environment is set here first.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_tmp = tempfile.TemporaryDirectory()
+PRIMARY_PATH = Path(_tmp.name) / "primary.db"
+REPLICA_PATH = Path(_tmp.name) / "replica.db"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{PRIMARY_PATH}"
+os.environ["READ_DATABASE_URL"] = f"sqlite+aiosqlite:///{REPLICA_PATH}"
+os.environ["REPLICA_MAX_LAG_SECONDS"] = "5"
+# Health checks run only when a test calls replica_router.check().
+os.environ["REPLICA_CHECK_INTERVAL_SECONDS"] = "3600"
+os.environ["CACHE_BACKEND"] = "none"
+os.environ["RATE_LIMIT_BACKEND"] = "none"
+os.environ["CART_SWEEP_INTERVAL_SECONDS"] = "0"
+os.environ["REQUEST_COALESCING"] = "false"
@@ -0,0 +1,98 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from app import database
+from app.database import engine, read_engine, replica_router
+from app.main import app
+from app.migrations import init_schema
+from app.models import Product
+
+# The same id on both sides with different names shows which database served a read.
+PRODUCT_ID = 1
+
+
+async def _seed(target, name: str) -> None:
+    # Core inserts: an ORM write would hold reads on the primary (read-your-writes).
+    async with target.begin() as conn:
+        await init_schema(conn)
+        await conn.execute(
+            insert(Product.__table__).values(id=PRODUCT_ID, name=name, price=100, category="Мебель")
+        )
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        client.portal.call(_seed, engine, "primary")
+        client.portal.call(_seed, read_engine, "replica")
+        yield client
+
+
+@pytest.fixture(autouse=True)
+def healthy_replica(client):
+    replica_router._primary_until = 0.0
+    assert client.portal.call(replica_router.check)
+
+
+def product_name(client: TestClient) -> str:
+    response = client.get(f"/api/products/{PRODUCT_ID}/")
+    assert response.status_code == 200
+    return response.json()["name"]
+
+
+def test_catalog_reads_use_the_replica(client):
+    assert replica_router.engine_for_reads() is read_engine
+    assert product_name(client) == "replica"
+    assert client.get("/api/products/").json()["results"][0]["name"] == "replica"
+
+
+def test_replica_error_falls_back_to_the_primary(client):
+    failovers = database.replica_failovers.values.get((), 0)
+    # Without its file the replica opens an empty database, so the read fails with "no such table".
+    path = Path(read_engine.url.database)
+    moved = path.with_suffix(".moved")
+    os.replace(path, moved)
+    try:
+        assert product_name(client) == "primary"
+    finally:
+        os.replace(moved, path)
+    assert database.replica_failovers.values[()] == failovers + 1
+    # Until the next successful health check reads skip the replica.
+    assert not replica_router.healthy
+    assert product_name(client) == "primary"
+
+
+def test_mark_unavailable_lasts_until_the_next_check(client):
+    replica_router.mark_unavailable()
+    assert replica_router.engine_for_reads() is engine
+    assert product_name(client) == "primary"
+    assert client.portal.call(replica_router.check)
+    assert product_name(client) == "replica"
+
+
+def test_hold_primary_keeps_reads_on_the_primary_for_max_lag(client, monkeypatch):
+    now = time.monotonic()
+    monkeypatch.setattr(database.time, "monotonic", lambda: now)
+    replica_router.hold_primary()
+    assert product_name(client) == "primary"
+    now += replica_router.max_lag - 0.1
+    assert product_name(client) == "primary"
+    now += 0.2
+    assert product_name(client) == "replica"
+
+
+def test_catalog_write_holds_reads_on_the_primary(client):
+    async def rename() -> None:
+        async with database.AsyncSessionLocal() as db:
+            product = await db.get(Product, PRODUCT_ID)
+            product.name = "primary, renamed"
+            await db.commit()
+
+    client.portal.call(rename)
+    assert replica_router.engine_for_reads() is engine
+    assert product_name(client) == "primary, renamed"
@@ -5,7 +5,7 @@ import Link from "next/link";
 import CompareTable from "@/components/CompareTable";
 import Header from "@/components/Header";
 import { useCompareStore } from "@/store/compareStore";
-import { fetchProduct } from "@/services/api";
+import { fetchProductsBulk } from "@/services/api";
 import type { ProductDetail } from "@/types";
 
 export default function ComparePage() {
@@ -22,9 +22,9 @@ export default function ComparePage() {
     }
     let cancelled = false;
     setLoading(true);
-    Promise.all(compareItems.map((p) => fetchProduct(p.id)))
-      .then((list) => {
-        if (!cancelled) setProducts(list);
+    fetchProductsBulk(compareItems.map((p) => p.id))
+      .then(({ results }) => {
+        if (!cancelled) setProducts(results);
       })
       .catch(() => {
         if (!cancelled) setProducts(compareItems as ProductDetail[]);
@@ -8,10 +8,10 @@ import SearchBar from "@/components/SearchBar";
 import FilterPanel from "@/components/FilterPanel";
 import Pagination from "@/components/Pagination";
 import ProductList from "@/components/ProductList";
-import { fetchProducts, addToCart } from "@/services/api";
+import { fetchProducts, fetchProductFacets, addToCart } from "@/services/api";
 import { useAuthStore } from "@/store/authStore";
 import { useCartStore } from "@/store/cartStore";
-import type { FilterState, Product, ProductsResponse } from "@/types";
+import type { FilterState, Product, ProductFacets, ProductsResponse } from "@/types";
 
 const DEFAULT_FILTERS: FilterState = {
   category: "",
@@ -72,6 +72,7 @@ function HomePageContent() {
     return { ...DEFAULT_FILTERS, ...fromUrl };
   });
   const [data, setData] = useState<ProductsResponse | null>(null);
+  const [facets, setFacets] = useState<ProductFacets | null>(null);
   const [loading, setLoading] = useState(true);
   const [dropTarget, setDropTarget] = useState(false);
 
@@ -107,6 +108,21 @@ function HomePageContent() {
     };
   }, [filters]);
 
+  const { category, min_price, max_price, search } = filters;
+  useEffect(() => {
+    let cancelled = false;
+    fetchProductFacets({ category, min_price, max_price, search })
+      .then((res) => {
+        if (!cancelled) setFacets(res);
+      })
+      .catch(() => {
+        if (!cancelled) setFacets(null);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [category, min_price, max_price, search]);
+
   useEffect(() => {
     const params = filtersToSearchParams(filters);
     const q = params.toString();
@@ -171,6 +187,10 @@ function HomePageContent() {
 
   const handleDragLeave = useCallback(() => setDropTarget(false), []);
 
+  // Facets list categories that have matches; keep the selected one even when it has none.
+  const categoryOptions = facets ? facets.categories.map((c) => c.category) : [...CATEGORIES];
+  if (category && !categoryOptions.includes(category)) categoryOptions.push(category);
+
   return (
     <div className="min-h-screen">
       <Header
@@ -188,7 +208,10 @@ function HomePageContent() {
           <FilterPanel
             filters={filters}
             onChange={applyFilters}
-            categories={CATEGORIES}
+            categories={categoryOptions}
+            categoryCounts={
+              facets ? Object.fromEntries(facets.categories.map((c) => [c.category, c.count])) : undefined
+            }
           />
           <div
             onDrop={handleDrop}
@@ -7,10 +7,25 @@ import { toast } from "react-toastify";
 import { useCartStore } from "@/store/cartStore";
 import { formatPrice } from "@/utils/helpers";
 import {
+  applyCartBatch,
   fetchCart,
   updateCartItem,
   removeCartItem,
 } from "@/services/api";
+import type { CartOperation, CartResponse } from "@/types";
+
+// The server no longer has the cart saved in this browser (new session, swept or expired token):
+// put the saved lines back with one batch request instead of one request per line.
+function restoreCart(cart: CartResponse): Promise<CartResponse> {
+  const saved = useCartStore.getState().items;
+  if (cart.items.length > 0 || saved.length === 0) return Promise.resolve(cart);
+  const operations: CartOperation[] = saved.map((i) => ({
+    op: "set",
+    product_id: i.product_id,
+    quantity: i.quantity,
+  }));
+  return applyCartBatch(operations).catch(() => cart);
+}
 
 export default function Cart() {
   const { items, total, setCart, updateItemOptimistic, removeItemOptimistic, rollbackUpdate, rollbackRemove } =
@@ -20,6 +35,7 @@ export default function Cart() {
   useEffect(() => {
     let cancelled = false;
     fetchCart()
+      .then(restoreCart)
       .then((cart) => {
         if (!cancelled) {
           useCartStore.getState().setCart(cart.items, cart.total);
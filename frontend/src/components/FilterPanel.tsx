@@ -6,9 +6,10 @@ interface FilterPanelProps {
   filters: FilterState;
   onChange: (f: Partial<FilterState>) => void;
   categories: string[];
+  categoryCounts?: Record<string, number>;
 }
 
-export default function FilterPanel({ filters, onChange, categories }: FilterPanelProps) {
+export default function FilterPanel({ filters, onChange, categories, categoryCounts }: FilterPanelProps) {
   return (
     <aside className="rounded-2xl border-2 border-slate-200/80 bg-white p-5 shadow-sm">
       <h3 className="font-semibold text-slate-800 mb-4">Фильтры</h3>
@@ -23,7 +24,7 @@ export default function FilterPanel({ filters, onChange, categories }: FilterPan
             <option value="">Все</option>
             {categories.map((c) => (
               <option key={c} value={c}>
-                {c}
+                {categoryCounts ? `${c} (${categoryCounts[c] ?? 0})` : c}
               </option>
             ))}
           </select>
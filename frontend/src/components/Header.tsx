@@ -1,8 +1,10 @@
 "use client";
 
 import Link from "next/link";
-import { useEffect } from "react";
+import { useEffect, useRef, useState } from "react";
 import { useAuthStore } from "@/store/authStore";
+import { useCartStore } from "@/store/cartStore";
+import { fetchCartSummary } from "@/services/api";
 
 interface HeaderProps {
   showSearch?: boolean;
@@ -12,10 +14,29 @@ interface HeaderProps {
 export default function Header({ showSearch, searchSlot }: HeaderProps) {
   const { user, loaded, loadUser, logout } = useAuthStore();
 
+  const cartItems = useCartStore((s) => s.items);
+  const [cartCount, setCartCount] = useState(0);
+  const mounted = useRef(false);
+
   useEffect(() => {
     loadUser();
   }, [loadUser]);
 
+  // The badge starts from the server summary (one-row query), then follows local cart changes.
+  useEffect(() => {
+    fetchCartSummary()
+      .then((summary) => setCartCount(summary.item_count))
+      .catch(() => {});
+  }, []);
+
+  useEffect(() => {
+    if (!mounted.current) {
+      mounted.current = true;
+      return;
+    }
+    setCartCount(cartItems.reduce((sum, item) => sum + item.quantity, 0));
+  }, [cartItems]);
+
   return (
     <header className="sticky top-0 z-10 border-b border-slate-200/80 bg-white/90 backdrop-blur-md shadow-sm">
       <div className="mx-auto flex max-w-7xl items-center justify-between gap-4 px-4 py-3">
@@ -28,6 +49,11 @@ export default function Header({ showSearch, searchSlot }: HeaderProps) {
             className="rounded-xl border-2 border-slate-200 bg-white px-4 py-2 text-sm font-medium text-slate-600 hover:border-emerald-400 hover:bg-emerald-50 hover:text-emerald-700 transition-colors"
           >
             Корзина
+            {cartCount > 0 && (
+              <span className="ml-2 rounded-full bg-emerald-600 px-2 py-0.5 text-xs font-semibold text-white">
+                {cartCount}
+              </span>
+            )}
           </Link>
           {loaded && (
             <>
@@ -1,13 +1,17 @@
 import axios, { type AxiosInstance } from "axios";
 import type {
   ProductDetail,
+  ProductBulkResponse,
   ProductsResponse,
+  ProductFacets,
   CartResponse,
+  CartSummary,
+  CartOperation,
   FilterState,
   User,
   TokenResponse,
 } from "@/types";
-import { getOrCreateSessionId, getAuthToken } from "@/utils/helpers";
+import { getOrCreateSessionId, getAuthToken, getCartToken, storeCartToken } from "@/utils/helpers";
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
 
@@ -22,12 +26,30 @@ function createClient(): AxiosInstance {
     config.headers["X-Session-ID"] = getOrCreateSessionId();
     const token = getAuthToken();
     if (token) config.headers.Authorization = `Bearer ${token}`;
+    const cartToken = getCartToken();
+    if (cartToken) config.headers["X-Cart-Token"] = cartToken;
     return config;
   });
 
+  client.interceptors.response.use((response) => {
+    const cartToken = response.headers["x-cart-token"];
+    if (typeof cartToken === "string") storeCartToken(cartToken);
+    return response;
+  });
+
   return client;
 }
 
+// With client-held carts every mutation must carry the token returned by the previous one,
+// so cart writes are sent one at a time.
+let cartQueue: Promise<unknown> = Promise.resolve();
+
+function serialized<T>(request: () => Promise<T>): Promise<T> {
+  const next = cartQueue.then(request, request);
+  cartQueue = next.catch(() => undefined);
+  return next;
+}
+
 const api = createClient();
 
 export async function authLogin(email: string, password: string): Promise<TokenResponse> {
@@ -57,21 +79,40 @@ export async function fetchProducts(
   return data;
 }
 
+export async function fetchProductFacets(
+  params: Pick<Partial<FilterState>, "category" | "min_price" | "max_price" | "search"> = {}
+): Promise<ProductFacets> {
+  const { data } = await api.get<ProductFacets>("/api/products/facets", { params });
+  return data;
+}
+
 export async function fetchProduct(id: number): Promise<ProductDetail> {
   const { data } = await api.get<ProductDetail>(`/api/products/${id}/`);
   return data;
 }
 
+export async function fetchProductsBulk(ids: number[]): Promise<ProductBulkResponse> {
+  const { data } = await api.post<ProductBulkResponse>("/api/products/bulk", { ids });
+  return data;
+}
+
 export async function fetchCart(): Promise<CartResponse> {
   const { data } = await api.get<CartResponse>("/api/cart/");
   return data;
 }
 
+export async function fetchCartSummary(): Promise<CartSummary> {
+  const { data } = await api.get<CartSummary>("/api/cart/summary");
+  return data;
+}
+
 export async function addToCart(productId: number, quantity: number): Promise<CartResponse> {
-  const { data } = await api.post<CartResponse>("/api/cart/", {
-    product_id: productId,
-    quantity,
-  });
+  const { data } = await serialized(() =>
+    api.post<CartResponse>("/api/cart/", {
+      product_id: productId,
+      quantity,
+    })
+  );
   return data;
 }
 
@@ -79,11 +120,16 @@ export async function updateCartItem(
   itemId: number,
   quantity: number
 ): Promise<CartResponse> {
-  const { data } = await api.put<CartResponse>(`/api/cart/${itemId}/`, { quantity });
+  const { data } = await serialized(() => api.put<CartResponse>(`/api/cart/${itemId}/`, { quantity }));
   return data;
 }
 
 export async function removeCartItem(itemId: number): Promise<CartResponse> {
-  const { data } = await api.delete<CartResponse>(`/api/cart/${itemId}/`);
+  const { data } = await serialized(() => api.delete<CartResponse>(`/api/cart/${itemId}/`));
+  return data;
+}
+
+export async function applyCartBatch(operations: CartOperation[]): Promise<CartResponse> {
+  const { data } = await serialized(() => api.post<CartResponse>("/api/cart/batch", { operations }));
   return data;
 }
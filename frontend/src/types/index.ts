@@ -10,6 +10,11 @@ export interface ProductDetail extends Product {
   description: string | null;
 }
 
+export interface ProductBulkResponse {
+  results: ProductDetail[];
+  missing: number[];
+}
+
 export interface ProductsResponse {
   count: number;
   next: string | null;
@@ -17,6 +22,25 @@ export interface ProductsResponse {
   results: Product[];
 }
 
+export interface CategoryFacet {
+  category: string;
+  count: number;
+}
+
+export interface PriceBucket {
+  min: number;
+  max: number | null;
+  count: number;
+}
+
+export interface ProductFacets {
+  count: number;
+  min_price: number | null;
+  max_price: number | null;
+  categories: CategoryFacet[];
+  price_buckets: PriceBucket[];
+}
+
 export interface CartItem {
   id: number;
   product_id: number;
@@ -30,9 +54,22 @@ export interface CartItem {
 export interface CartResponse {
   id: number;
   items: CartItem[];
+  item_count: number;
   total: number;
 }
 
+export interface CartSummary {
+  id: number;
+  item_count: number;
+  total: number;
+}
+
+export interface CartOperation {
+  op: "add" | "set" | "remove";
+  product_id: number;
+  quantity?: number;
+}
+
 export interface FilterState {
   category: string;
   min_price: string;
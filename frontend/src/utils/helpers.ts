@@ -16,6 +16,20 @@ export function clearAuthToken(): void {
   localStorage.removeItem(AUTH_TOKEN_KEY);
 }
 
+const CART_TOKEN_KEY = "catalog_cart_token";
+
+// Signed cart sent by the API in X-Cart-Token when carts are kept client-side; empty means server-side.
+export function getCartToken(): string | null {
+  if (typeof window === "undefined") return null;
+  return localStorage.getItem(CART_TOKEN_KEY);
+}
+
+export function storeCartToken(token: string): void {
+  if (typeof window === "undefined") return;
+  if (token) localStorage.setItem(CART_TOKEN_KEY, token);
+  else localStorage.removeItem(CART_TOKEN_KEY);
+}
+
 export function getOrCreateSessionId(): string {
   if (typeof window === "undefined") return "";
   let id = localStorage.getItem(SESSION_KEY);